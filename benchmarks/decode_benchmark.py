@@ -0,0 +1,157 @@
+"""
+Offline decode benchmark on the flatbuffer fixtures of flatbuffer_fixtures.py.
+
+Measures the path from the raw response body to the DataFrames (framing, OpenMeteoService decoding, frame
+construction) and writes the results as JSON, so runs of different commits can be compared:
+
+    python benchmarks/decode_benchmark.py
+    python benchmarks/decode_benchmark.py --compare benchmarks/results/decode_<commit>.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import config.settings
+from domain.services.open_meteo_service import OpenMeteoService, daily_columns, hourly_columns
+from flatbuffer_fixtures import load_fixtures
+from infrastructure.api_clients.open_meteo_api import OpenMeteoClient
+
+results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def decode(data: bytes, interval: str) -> list[pd.DataFrame]:
+    if interval == "daily":
+        params_order, column_names = config.settings.daily_params, daily_columns
+    else:
+        params_order, column_names = config.settings.hourly_params, hourly_columns
+
+    frames = []
+    for response in OpenMeteoClient.decode(data=data):
+        variables = response.Daily() if interval == "daily" else response.Hourly()
+        frames.append(OpenMeteoService._columnar_data_handling(variables=variables, params_order=params_order,
+                                                               column_names=column_names))
+    return frames
+
+
+def measure(entry: dict, min_time: float, repeats: int) -> dict:
+    data, interval = entry["data"], entry["interval"]
+    frames = decode(data=data, interval=interval)
+    rows = sum(len(frame) for frame in frames)
+
+    # Calibrate the number of calls per timing so that one timing takes at least min_time
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            decode(data=data, interval=interval)
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 2
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            decode(data=data, interval=interval)
+        timings.append((time.perf_counter() - start) / number)
+    seconds = statistics.median(timings)
+
+    # Memory and allocations of a single decode, counted by tracemalloc: the blocks allocated during the decode
+    # that are still alive when it returns (the frames and everything they keep), by the file that allocated them
+    gc.collect()
+    tracemalloc.start()
+    frames = decode(data=data, interval=interval)
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    tracemalloc.stop()
+    statistics_by_file = snapshot.statistics("filename")
+    del frames
+
+    return {
+        "fixture": entry["file"],
+        "interval": interval,
+        "forecast_days": entry["forecast_days"],
+        "locations": entry["locations"],
+        "rows": rows,
+        "bytes": len(data),
+        "seconds": seconds,
+        "seconds_stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "rows_per_second": rows / seconds,
+        "locations_per_second": entry["locations"] / seconds,
+        "peak_memory_bytes": peak,
+        "allocations": sum(stat.count for stat in statistics_by_file),
+        "allocated_bytes": sum(stat.size for stat in statistics_by_file),
+    }
+
+
+def commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: list[dict], baseline_path: str) -> None:
+    with open(baseline_path) as file:
+        baseline = {result["fixture"]: result for result in json.load(file)["results"]}
+    print(f"\n{'fixture':<24}{'speedup':>10}{'peak memory':>14}{'allocations':>14}")
+    for result in results:
+        before = baseline.get(result["fixture"])
+        if before is None:
+            continue
+        speedup = before["seconds"] / result["seconds"]
+        memory = result["peak_memory_bytes"] / max(before["peak_memory_bytes"], 1)
+        # Results of runs before the allocation count have none
+        allocations = result["allocations"] / max(before.get("allocations", 0), 1) if "allocations" in before else None
+        print(f"{result['fixture']:<24}{speedup:>9.2f}x{memory:>13.2f}x"
+              + (f"{allocations:>13.2f}x" if allocations is not None else f"{'-':>14}"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="result file, defaults to benchmarks/results/decode_<commit>.json")
+    parser.add_argument("--compare", help="result file of an earlier run")
+    parser.add_argument("--filter", default="", help="only run fixtures containing this text")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per timing")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'fixture':<24}{'ms':>10}{'rows/s':>14}{'locations/s':>14}{'peak KiB':>10}{'allocations':>12}")
+    for entry in load_fixtures():
+        if args.filter not in entry["file"]:
+            continue
+        result = measure(entry=entry, min_time=args.min_time, repeats=args.repeats)
+        results.append(result)
+        print(f"{result['fixture']:<24}{result['seconds'] * 1000:>10.3f}{result['rows_per_second']:>14.0f}"
+              f"{result['locations_per_second']:>14.0f}{result['peak_memory_bytes'] / 1024:>10.1f}"
+              f"{result['allocations']:>12}")
+
+    output = args.output or os.path.join(results_dir, f"decode_{commit()}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump({
+            "commit": commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "results": results,
+        }, file, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results=results, baseline_path=args.compare)
+
+
+if __name__ == "__main__":
+    main()
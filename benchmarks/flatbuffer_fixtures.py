@@ -0,0 +1,205 @@
+"""
+Open-Meteo flatbuffer fixtures for the offline benchmarks.
+
+The fixtures are stored exactly as the forecast endpoint sends them (size prefixed WeatherApiResponse
+messages, one per location) and are listed in fixtures/index.json with the parameters they answer.
+Synthesized daily fixtures are aggregated from the same hourly series by reference_daily below, written
+independently of the app's DailyAggregation, so that tests/test_daily_aggregation.py can check it against them.
+
+    python benchmarks/flatbuffer_fixtures.py            # synthesize the fixture set
+    python benchmarks/flatbuffer_fixtures.py --record   # record the same set from the live API
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import flatbuffers
+import numpy as np
+import requests
+from openmeteo_sdk.Variable import Variable
+
+import config.settings
+
+fixture_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# (interval, forecast_days, locations) of every fixture
+fixture_set = [
+    (interval, days, locations)
+    for interval in ("hourly", "daily")
+    for days in (1, 7, 16)
+    for locations in (1, 25)
+]
+
+# Start of the synthetic series, 2025-06-01 00:00 Europe/Berlin
+_start_time = 1748728800
+_timezone = "Europe/Berlin"
+
+
+def fixture_name(interval: str, days: int, locations: int) -> str:
+    return f"{interval}_{days}d_{locations}loc.bin"
+
+
+def _variable_id(param: str) -> int:
+    # Best effort mapping onto the sdk enum, the decoder of the app relies on the parameter order only
+    for suffix in ("_2m", "_10m"):
+        param = param.split(suffix)[0]
+    for name in (param, param.rstrip("s")):
+        if hasattr(Variable, name):
+            return getattr(Variable, name)
+    return Variable.undefined
+
+
+def _synthetic_values(param: str, timestamps: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    hours = (timestamps - _start_time) / 3600
+    daily_cycle = np.sin((hours - 9) / 24 * 2 * np.pi)
+    if "temperature" in param:
+        values = 18 + 7 * daily_cycle + rng.normal(0, 1.5, len(hours))
+    elif param.startswith(("rain", "showers", "snowfall")):
+        values = np.where(rng.random(len(hours)) < 0.2, rng.gamma(1.2, 1.5, len(hours)), 0.0)
+    elif "direction" in param:
+        values = (240 + rng.normal(0, 40, len(hours))) % 360
+    elif param.startswith(("wind", "wind_gusts")):
+        values = np.abs(12 + 6 * daily_cycle + rng.normal(0, 3, len(hours)))
+    elif param.startswith(("cloud_cover", "relative_humidity")):
+        values = np.clip(60 - 20 * daily_cycle + rng.normal(0, 15, len(hours)), 0, 100)
+    elif param.startswith("visibility"):
+        values = np.clip(24000 + rng.normal(0, 8000, len(hours)), 100, 60000)
+    elif param == "weather_code":
+        values = rng.choice([0, 1, 2, 3, 45, 61, 63, 80, 95], len(hours))
+    else:
+        values = rng.normal(0, 1, len(hours))
+    return values.astype(np.float32)
+
+
+def encode_response(latitude: float, longitude: float, interval: str, time: int, time_end: int, step: int,
+                    columns: list[tuple[str, np.ndarray]]) -> bytes:
+    """
+    Encodes one size prefixed WeatherApiResponse with the hourly or daily block filled
+    """
+    builder = flatbuffers.Builder(1024 + sum(len(values) * 4 for _, values in columns))
+
+    variables = []
+    for param, values in columns:
+        values_offset = builder.CreateNumpyVector(values.astype(np.float32))
+        builder.StartObject(4)
+        builder.PrependUint8Slot(0, _variable_id(param), 0)
+        builder.PrependUOffsetTRelativeSlot(3, values_offset, 0)
+        variables.append(builder.EndObject())
+
+    builder.StartVector(4, len(variables), 4)
+    for variable in reversed(variables):
+        builder.PrependUOffsetTRelative(variable)
+    variables_offset = builder.EndVector()
+
+    builder.StartObject(4)
+    builder.PrependInt64Slot(0, time, 0)
+    builder.PrependInt64Slot(1, time_end, 0)
+    builder.PrependInt32Slot(2, step, 0)
+    builder.PrependUOffsetTRelativeSlot(3, variables_offset, 0)
+    block_offset = builder.EndObject()
+
+    timezone_offset = builder.CreateString(_timezone)
+    builder.StartObject(12)
+    builder.PrependFloat32Slot(0, latitude, 0.0)
+    builder.PrependFloat32Slot(1, longitude, 0.0)
+    builder.PrependInt32Slot(6, 7200, 0)
+    builder.PrependUOffsetTRelativeSlot(7, timezone_offset, 0)
+    builder.PrependUOffsetTRelativeSlot(10 if interval == "daily" else 11, block_offset, 0)
+    builder.FinishSizePrefixed(builder.EndObject())
+    return bytes(builder.Output())
+
+
+def reference_daily(param: str, hourly: dict[str, np.ndarray], timestamps: np.ndarray) -> np.ndarray:
+    """
+    One daily parameter from the hourly series, per local calendar day, following the open-meteo definitions:
+    <variable>_max/_min/_mean/_sum, the speed weighted vector mean for _dominant directions and the most severe
+    (highest) weather code. Plain numpy on purpose, it must not share code with DailyAggregation.
+    """
+    zone = ZoneInfo(_timezone)
+    days = np.array([datetime.fromtimestamp(int(t), zone).date().toordinal() for t in timestamps])
+    groups = [days == day for day in np.unique(days)]
+
+    if param == "weather_code":
+        return np.array([hourly[param][group].max() for group in groups], dtype=np.float32)
+    if param.endswith("_dominant"):
+        direction = np.deg2rad(hourly[param.removesuffix("_dominant")].astype(np.float64))
+        speed = hourly["wind_speed_10m"].astype(np.float64)
+        u = np.array([(speed * np.sin(direction))[group].sum() for group in groups])
+        v = np.array([(speed * np.cos(direction))[group].sum() for group in groups])
+        return (np.rad2deg(np.arctan2(u, v)) % 360).astype(np.float32)
+
+    source, how = param.rsplit("_", 1)
+    values = hourly[source].astype(np.float64)
+    aggregate = {"max": np.max, "min": np.min, "mean": np.mean, "sum": np.sum}[how]
+    return np.array([aggregate(values[group]) for group in groups], dtype=np.float32)
+
+
+def synthesize(interval: str, days: int, locations: int, seed: int = 42, start_time: int = _start_time,
+               params: list[str] | None = None) -> bytes:
+    """
+    Daily fixtures are aggregated from the same hourly series, so both fixture kinds describe the same weather.
+    params selects and orders the variables, by default all of daily_params or hourly_params.
+    """
+    rng = np.random.default_rng(seed)
+    step = 86400 if interval == "daily" else 3600
+    time_end = start_time + days * 86400
+    timestamps = np.arange(start_time, time_end, 3600)
+
+    body = bytearray()
+    for i in range(locations):
+        hourly = [(param, _synthetic_values(param, timestamps, rng)) for param in config.settings.hourly_params]
+        if interval == "daily":
+            columns = [(param, reference_daily(param=param, hourly=dict(hourly), timestamps=timestamps))
+                       for param in params or config.settings.daily_params]
+        else:
+            columns = hourly if params is None else [(param, dict(hourly)[param]) for param in params]
+        body += encode_response(latitude=47.5 + i * 0.1, longitude=6.5 + i * 0.1, interval=interval,
+                                time=start_time, time_end=time_end, step=step, columns=columns)
+    return bytes(body)
+
+
+def record(interval: str, days: int, locations: int) -> bytes:
+    params = {
+        "latitude": ",".join(f"{47.5 + i * 0.1:.4f}" for i in range(locations)),
+        "longitude": ",".join(f"{6.5 + i * 0.1:.4f}" for i in range(locations)),
+        "timezone": _timezone,
+        "forecast_days": days,
+        interval: ",".join(config.settings.daily_params if interval == "daily" else config.settings.hourly_params),
+        "format": "flatbuffers",
+    }
+    response = requests.get("https://api.open-meteo.com/v1/forecast", params=params, timeout=60)
+    response.raise_for_status()
+    return response.content
+
+
+def write_fixtures(live: bool) -> None:
+    os.makedirs(fixture_dir, exist_ok=True)
+    index = []
+    for interval, days, locations in fixture_set:
+        data = record(interval, days, locations) if live else synthesize(interval, days, locations)
+        name = fixture_name(interval, days, locations)
+        with open(os.path.join(fixture_dir, name), "wb") as file:
+            file.write(data)
+        index.append({"file": name, "interval": interval, "forecast_days": days, "locations": locations,
+                      "source": "open-meteo" if live else "synthetic"})
+        print(f"{name}: {len(data)} bytes")
+
+    with open(os.path.join(fixture_dir, "index.json"), "w") as file:
+        json.dump(index, file, indent=2)
+
+
+def load_fixtures() -> list[dict]:
+    with open(os.path.join(fixture_dir, "index.json")) as file:
+        index = json.load(file)
+    for entry in index:
+        with open(os.path.join(fixture_dir, entry["file"]), "rb") as file:
+            entry["data"] = file.read()
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="record the fixtures from the live API")
+    write_fixtures(live=parser.parse_args().record)
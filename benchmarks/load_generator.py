@@ -0,0 +1,118 @@
+"""
+End to end load test of WeatherFacade.get_weather against the stub server (or any upstream).
+
+    python benchmarks/stub_server.py --port 8080 &
+    python benchmarks/load_generator.py --stub http://127.0.0.1:8080 --users 50 --duration 30
+
+Every simulated user is a thread sharing one facade, like Streamlit sessions do. Locations are drawn with a
+Zipf like popularity from a pool, so caches see a realistic mix of hot and cold locations. The caches start
+empty in a temporary directory unless --warm is given.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+
+
+def run_user(facade, locations: list, weights: list, deadline: float, think_time: float, seed: int) -> tuple:
+    from domain.models.location import Location
+
+    rng = random.Random(seed)
+    latencies, errors = [], 0
+    while time.monotonic() < deadline:
+        country, city, postal_code = rng.choices(locations, weights=weights)[0]
+        time_interval = rng.choice(["days", "hours"])
+        duration = (-rng.randint(0, 7), rng.randint(1, 7))
+        start = time.perf_counter()
+        try:
+            facade.get_weather(location=Location(country=country, city=city, postal_code=postal_code),
+                               time_interval=time_interval, duration=duration)
+            latencies.append(time.perf_counter() - start)
+        except ValueError:
+            errors += 1
+        if think_time:
+            time.sleep(rng.expovariate(1 / think_time))
+    return latencies, errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stub", help="base url of the stub server, e.g. http://127.0.0.1:8080")
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=20, help="seconds to run")
+    parser.add_argument("--locations", type=int, default=200, help="size of the location pool")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between requests in seconds")
+    parser.add_argument("--warm", action="store_true", help="keep the caches of the working directory")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if args.stub:
+        stub = urlparse(args.stub)
+        os.environ["OPEN_METEO_FORECAST_URL"] = f"{args.stub.rstrip('/')}/v1/forecast"
+        os.environ["NOMINATIM_DOMAIN"] = stub.netloc
+        os.environ["NOMINATIM_SCHEME"] = stub.scheme
+        # The stub has no usage policy, spacing the geocoding requests would measure the rate limiter only
+        os.environ["NOMINATIM_MIN_DELAY"] = "0"
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    if not args.warm:
+        os.chdir(tempfile.mkdtemp(prefix="weather_load_"))  # cache files are relative to the working directory
+
+    # Imported after the environment is set, settings read it on import
+    from application.resources import Resources
+    from config.metrics import Metrics
+
+    Resources.setup_logging()
+    facade = Resources.get_facade(api_name="open-meteo")
+
+    locations = [("Germany", f"Loadtest City {i}", f"{10000 + i}") for i in range(args.locations)]
+    weights = [1 / (rank + 1) for rank in range(args.locations)]
+    deadline = time.monotonic() + args.duration
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        futures = [pool.submit(run_user, facade, locations, weights, deadline, args.think_time, seed)
+                   for seed in range(args.users)]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    latencies = np.array([latency for user_latencies, _ in results for latency in user_latencies])
+    errors = sum(user_errors for _, user_errors in results)
+    report = {
+        "users": args.users,
+        "seconds": elapsed,
+        "requests": int(len(latencies)),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50) * 1000) if len(latencies) else None,
+            "p95": float(np.percentile(latencies, 95) * 1000) if len(latencies) else None,
+            "p99": float(np.percentile(latencies, 99) * 1000) if len(latencies) else None,
+            "max": float(latencies.max() * 1000) if len(latencies) else None,
+        },
+        "threads": threading.active_count(),
+        "metrics": Metrics.snapshot(),
+        "geocode_cache": facade.geocode_cache.stats(),
+        "frame_cache": facade.cache.frame_cache.stats(),
+    }
+
+    print(f"{report['requests']} requests, {errors} errors in {elapsed:.1f} s, "
+          f"{report['throughput']:.1f} requests/s")
+    print("latency ms: " + ", ".join(f"{name} {value:.1f}" for name, value in report["latency_ms"].items()
+                                      if value is not None))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    Resources.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Local stand-in for the Open-Meteo forecast endpoint and Nominatim, for load tests without the real upstream.
+
+    python benchmarks/stub_server.py --port 8080 --latency 40 --error-rate 0.01 --rps 200
+    OPEN_METEO_FORECAST_URL=http://localhost:8080/v1/forecast NOMINATIM_DOMAIN=localhost:8080 \\
+        NOMINATIM_SCHEME=http streamlit run src/application/ui/webapp_ui.py
+
+Forecasts are synthesized from today's local midnight, so range slicing and "current weather" behave like with
+the real API. --recorded serves the fixture files instead (fixed dates). /v1/archive synthesizes the requested
+start_date..end_date. Geocoding answers from fixtures/geocode.json, other addresses get stable coordinates
+derived from their hash, addresses containing "notfound" are not found.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+import pandas as pd
+from aiohttp import web
+
+from flatbuffer_fixtures import fixture_dir, fixture_name, synthesize
+
+
+class TokenBucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class StubServer:
+    def __init__(self, latency: float, jitter: float, error_rate: float, rps: float, geocode_rps: float,
+                 recorded: bool):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.recorded = recorded
+        self.buckets = {"forecast": TokenBucket(rps), "archive": TokenBucket(rps), "geocode": TokenBucket(geocode_rps)}
+        self.requests = {"forecast": 0, "archive": 0, "geocode": 0, "throttled": 0, "errors": 0}
+        self._payloads = {}
+
+        with open(os.path.join(fixture_dir, "geocode.json"), encoding="utf-8") as file:
+            self.places = json.load(file)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/v1/forecast", self.forecast)
+        app.router.add_get("/v1/archive", self.archive)
+        app.router.add_get("/search", self.geocode)
+        app.router.add_get("/stats", self.stats)
+        return app
+
+    async def _simulate(self, endpoint: str) -> web.Response | None:
+        self.requests[endpoint] += 1
+        delay = max(0.0, random.gauss(self.latency, self.jitter)) / 1000
+        await asyncio.sleep(delay)
+        if not self.buckets[endpoint].take():
+            self.requests["throttled"] += 1
+            return web.json_response({"error": True, "reason": "Too many concurrent requests"}, status=429)
+        if random.random() < self.error_rate:
+            self.requests["errors"] += 1
+            return web.json_response({"error": True, "reason": "Simulated upstream error"}, status=500)
+        return None
+
+    def _payload(self, interval: str, past_days: int, forecast_days: int, timezone: str) -> bytes:
+        days = past_days + forecast_days
+        if self.recorded:
+            key = (interval, days)
+            if key not in self._payloads:
+                with open(os.path.join(fixture_dir, fixture_name(interval, days, 1)), "rb") as file:
+                    self._payloads[key] = file.read()
+            return self._payloads[key]
+
+        today = pd.Timestamp.now(tz=timezone).normalize()
+        key = (interval, past_days, forecast_days, timezone, today)
+        if key not in self._payloads:
+            start_time = int((today - pd.Timedelta(days=past_days)).timestamp())
+            self._payloads[key] = synthesize(interval=interval, days=days, locations=1, start_time=start_time)
+        return self._payloads[key]
+
+    async def forecast(self, request: web.Request) -> web.Response:
+        response = await self._simulate("forecast")
+        if response is not None:
+            return response
+
+        query = request.query
+        interval = "daily" if "daily" in query else "hourly"
+        locations = len(query.get("latitude", "0").split(","))
+        try:
+            payload = self._payload(interval=interval, past_days=int(query.get("past_days", 0)),
+                                    forecast_days=int(query.get("forecast_days", 7)),
+                                    timezone=query.get("timezone", "GMT"))
+        except FileNotFoundError:
+            return web.json_response({"error": True, "reason": "No fixture for this range"}, status=400)
+
+        # Every coordinate gets the same single location payload
+        return web.Response(body=payload * locations, content_type="application/octet-stream")
+
+    async def archive(self, request: web.Request) -> web.Response:
+        response = await self._simulate("archive")
+        if response is not None:
+            return response
+
+        query = request.query
+        interval = "daily" if "daily" in query else "hourly"
+        timezone = query.get("timezone", "GMT")
+        start = pd.Timestamp(query["start_date"], tz=timezone)
+        days = (pd.Timestamp(query["end_date"], tz=timezone) - start).days + 1
+        # Synthesized per request, archive ranges are hardly ever asked for twice
+        payload = synthesize(interval=interval, days=days, locations=1, start_time=int(start.timestamp()),
+                             params=",".join(query.getall(interval)).split(","))
+        return web.Response(body=payload, content_type="application/octet-stream")
+
+    async def geocode(self, request: web.Request) -> web.Response:
+        response = await self._simulate("geocode")
+        if response is not None:
+            return response
+
+        address = request.query.get("q", "").strip().lower()
+        if "notfound" in address:
+            return web.json_response([])
+        place = self.places.get(address)
+        if place is None:
+            digest = int(hashlib.sha1(address.encode("utf-8")).hexdigest()[:8], 16)
+            place = {"lat": f"{47.3 + (digest % 5000) / 1000:.4f}",
+                     "lon": f"{6.0 + (digest // 5000 % 9000) / 1000:.4f}",
+                     "display_name": address}
+        return web.json_response([place])
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.requests)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=50, help="mean latency in ms")
+    parser.add_argument("--jitter", type=float, default=15, help="standard deviation of the latency in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--rps", type=float, default=0, help="forecast requests per second, 0 is unlimited")
+    parser.add_argument("--geocode-rps", type=float, default=0, help="geocode requests per second, 0 is unlimited")
+    parser.add_argument("--recorded", action="store_true", help="serve the fixture files instead of today's data")
+    args = parser.parse_args()
+
+    server = StubServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, rps=args.rps,
+                        geocode_rps=args.geocode_rps, recorded=args.recorded)
+    web.run_app(server.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Headless HTTP/JSON entry point next to the Streamlit UI, sharing the process wide facade and its caches.
+
+    python -m application.api.weather_api --port 8000
+
+    GET  /v1/weather?country=Germany&city=Berlin&postal_code=10115&interval=hours&past_days=1&forecast_days=7
+    POST /v1/weather/batch {"locations": [{"country": "Germany", "city": "Berlin"}], "interval": "days"}
+    GET  /health
+    GET  /metrics (Prometheus text, ?format=json for the cache statistics as well)
+
+format=arrow (query parameter or body field) answers with an Arrow IPC stream instead of JSON. An unknown address
+fails only its own batch entry, it is listed with "found": false and has no rows.
+"""
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+from pandas import DataFrame
+
+import config.settings
+from application.resources import Resources
+from config.metrics import Metrics
+from domain.models.location import Location, LocationNotFoundError
+from domain.services.export_service import ExportService, export_formats
+
+
+class WeatherApi:
+    """
+    The facade is blocking, calls run on a bounded worker pool. Requests above max_pending are rejected with 503
+    right away instead of queueing without limit, slow ones are answered with 504 after timeout seconds.
+    """
+
+    def __init__(self, workers: int = config.settings.api_workers,
+                 max_pending: int = config.settings.api_max_pending,
+                 timeout: float = config.settings.api_timeout):
+        self.facade = Resources.get_facade(api_name="open-meteo")
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pending = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.get("/v1/weather", self.weather),
+            web.post("/v1/weather/batch", self.weather_batch),
+            web.get("/health", self.health),
+            web.get("/metrics", self.metrics),
+        ])
+        app.on_cleanup.append(self._cleanup)
+        return app
+
+    async def weather(self, request: web.Request) -> web.Response:
+        query = request.query
+        try:
+            location = self._location(query)
+            interval, duration = self._span(query)
+            export_format = self._format(query)
+        except ValueError as e:
+            return self._error(str(e), status=400)
+
+        df = await self._run(self.facade.get_weather, location=location, time_interval=interval, duration=duration)
+        if isinstance(df, web.Response):
+            return df
+        return self._respond(df=df, export_format=export_format, locations=[location])
+
+    async def weather_batch(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+            entries = body.get("locations") or []
+            if len(entries) > config.settings.api_max_batch_locations:
+                raise ValueError(f"At most {config.settings.api_max_batch_locations} locations per request")
+            locations = [self._location(entry) for entry in entries]
+            if not locations:
+                raise ValueError("locations is empty")
+            interval, duration = self._span(body)
+            export_format = self._format(body)
+        except (ValueError, AttributeError, json.JSONDecodeError) as e:
+            return self._error(f"Invalid request: {e}", status=400)
+
+        # An unknown address does not fail the batch, it is reported with "found": false in its entry
+        df = await self._run(self.facade.get_weather_batch, locations=locations, time_interval=interval,
+                             duration=duration, skip_not_found=True)
+        if isinstance(df, web.Response):
+            return df
+        if df is None:
+            return self._error("None of the locations was found", status=404)
+        return self._respond(df=df, export_format=export_format, locations=locations)
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "pending": self._pending, "workers": self.workers,
+                                  "max_pending": self.max_pending})
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        if request.query.get("format") == "json":
+            scheduler = Resources.get_scheduler(api_name="open-meteo")
+            return web.json_response({
+                "metrics": Metrics.snapshot(),
+                "geocode_cache": self.facade.geocode_cache.stats(),
+                "frame_cache": self.facade.cache.frame_cache.stats(),
+                "prewarm": scheduler.stats() if scheduler else None,
+            })
+        return web.Response(text=Metrics.to_prometheus(), content_type="text/plain")
+
+    async def _run(self, func, **kwargs):
+        """
+        Runs a facade call on the pool, the slot is only freed when the call has really finished,
+        a timed out call keeps its worker busy and still counts against max_pending
+        """
+        if self._pending >= self.max_pending:
+            Metrics.count("api_rejected")
+            return self._error("Too many pending requests", status=503, headers={"Retry-After": "1"})
+        self._pending += 1
+        future = asyncio.get_running_loop().run_in_executor(self.executor, lambda: func(**kwargs))
+        future.add_done_callback(self._release)
+        try:
+            with Metrics.measure("api"):
+                return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            Metrics.count("api_timeouts")
+            return self._error("The weather service did not answer in time", status=504)
+        except LocationNotFoundError as e:
+            # A missing location is the caller's fault, any other failure of the facade is an upstream one
+            return self._error(str(e), status=404)
+        except ValueError as e:
+            return self._error(str(e), status=502)
+
+    def _release(self, future) -> None:
+        self._pending -= 1
+
+    def _respond(self, df: DataFrame | None, export_format: str, locations: list[Location]) -> web.Response:
+        if df is None:
+            return self._error("No weather data", status=404)
+        if export_format == "arrow":
+            mime, _ = export_formats["arrow"]
+            return web.Response(body=ExportService.to_bytes(df=df, export_format="arrow"), content_type=mime)
+
+        records = df.reset_index().to_json(orient="records", date_format="iso")
+        meta = json.dumps({
+            "locations": [{"country": location.country, "city": location.city,
+                           "postal_code": location.postal_code,
+                           "found": location.coordinates is not None,
+                           "latitude": location.coordinates.latitude if location.coordinates else None,
+                           "longitude": location.coordinates.longitude if location.coordinates else None}
+                          for location in locations],
+            "fetched_at": df.attrs.get("fetched_at"),
+        })
+        # The records are already serialized by pandas, they are spliced in instead of being parsed again
+        return web.Response(text=f'{meta[:-1]}, "data": {records}}}', content_type="application/json")
+
+    @staticmethod
+    def _location(entry) -> Location:
+        country = (entry.get("country") or "").strip()
+        city = (entry.get("city") or "").strip()
+        postal_code = (entry.get("postal_code") or "").strip()
+        if not country:
+            raise ValueError("country is required")
+        if not city and not postal_code:
+            raise ValueError("city or postal_code is required")
+        return Location(country=country, city=city, postal_code=postal_code)
+
+    @staticmethod
+    def _span(entry) -> tuple[str, tuple]:
+        interval = entry.get("interval", "hours")
+        if interval not in ("hours", "days"):
+            raise ValueError("interval has to be hours or days")
+        try:
+            past_days = int(entry.get("past_days", 0))
+            forecast_days = int(entry.get("forecast_days", 7))
+        except TypeError:  # e.g. a JSON list or object
+            raise ValueError("past_days and forecast_days have to be integers")
+        # open-meteo limits of the forecast endpoint
+        if not 0 <= past_days <= 92 or not 0 <= forecast_days <= 16:
+            raise ValueError("past_days has to be within 0..92 and forecast_days within 0..16")
+        return interval, (-past_days, forecast_days)
+
+    @staticmethod
+    def _format(entry) -> str:
+        export_format = entry.get("format", "json")
+        if export_format not in ("json", "arrow"):
+            raise ValueError("format has to be json or arrow")
+        return export_format
+
+    @staticmethod
+    def _error(reason: str, status: int, headers: dict | None = None) -> web.Response:
+        return web.json_response({"error": True, "reason": reason}, status=status, headers=headers)
+
+    async def _cleanup(self, app: web.Application) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=config.settings.api_host)
+    parser.add_argument("--port", type=int, default=config.settings.api_port)
+    parser.add_argument("--workers", type=int, default=config.settings.api_workers)
+    args = parser.parse_args()
+
+    Resources.setup_logging()
+    api = WeatherApi(workers=args.workers)
+    web.run_app(api.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Builds the binary index of the offline geocoder (geocoder = "gazetteer") from GeoNames postal code dumps.
+
+    python -m application.cli.build_gazetteer DE.zip AT.zip CH.zip --country-info countryInfo.txt
+
+The dumps are the tab separated files of https://download.geonames.org/export/zip/ (allCountries.zip or one per
+country), zipped or extracted. countryInfo.txt (https://download.geonames.org/export/dump/) adds the English
+country names and ISO3 codes, without it only the ISO2 codes ("DE") are recognized as countries.
+The index is written to gazetteer_index_path and loaded by every process at startup.
+"""
+import argparse
+import json
+import logging
+import os
+import zipfile
+
+import pandas as pd
+from pandas import DataFrame
+
+import config.settings
+from application.resources import Resources
+from config.metrics import Metrics
+from domain.models.gazetteer import Gazetteer
+
+# Columns of the GeoNames postal code dumps that are kept, by position
+postal_columns = {0: "country_code", 1: "postal_code", 2: "place_name", 9: "latitude", 10: "longitude"}
+
+
+def read_postal_codes(path: str) -> DataFrame:
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            # The archives hold <country>.txt and a readme.txt
+            name = os.path.splitext(os.path.basename(path))[0] + ".txt"
+            with archive.open(name) as file:
+                return _read_postal_codes(file)
+    return _read_postal_codes(path)
+
+
+def _read_postal_codes(file) -> DataFrame:
+    # keep_default_na=False: "NA" is Namibia and not a missing value
+    df = pd.read_csv(file, sep="\t", header=None, usecols=list(postal_columns), dtype=str, keep_default_na=False,
+                     quoting=3)
+    df = df.rename(columns=postal_columns)
+    df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce")
+    df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce")
+    return df
+
+
+def read_country_names(path: str) -> dict[str, str]:
+    """
+    Country name and ISO3 code to ISO2 code from countryInfo.txt
+    """
+    df = pd.read_csv(path, sep="\t", header=None, comment="#", usecols=[0, 1, 4], dtype=str, keep_default_na=False)
+    names = dict(zip(df[4], df[0]))
+    names.update(zip(df[1], df[0]))
+    return names
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dumps", nargs="+", help="GeoNames postal code files (.txt or .zip)")
+    parser.add_argument("--country-info", help="GeoNames countryInfo.txt for the country names")
+    parser.add_argument("--output", default=config.settings.gazetteer_index_path)
+    args = parser.parse_args()
+
+    Resources.setup_logging()
+    logger = logging.getLogger(__name__)
+    with Metrics.measure("gazetteer_build"):
+        df = pd.concat([read_postal_codes(path) for path in args.dumps], ignore_index=True)
+        country_names = read_country_names(args.country_info) if args.country_info else None
+        gazetteer = Gazetteer.build(df=df, country_names=country_names)
+        gazetteer.save(path=args.output)
+    logger.info(f"Gazetteer index written to {args.output}")
+    print(json.dumps({"records": len(gazetteer.record_names), "postal_codes": len(gazetteer.postal_codes),
+                      "places": len(gazetteer.places), "countries": len(set(gazetteer.countries.values())),
+                      "bytes": os.path.getsize(args.output)}))
+
+
+if __name__ == "__main__":
+    main()
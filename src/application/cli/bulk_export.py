@@ -0,0 +1,175 @@
+"""
+Forecasts for long location lists, written as one Parquet file per input chunk.
+
+    python -m application.cli.bulk_export locations.csv out/ --interval hours --past-days 0 --forecast-days 7
+
+The input is a CSV or Parquet file with the columns country, city and postal_code. It is read chunk by chunk,
+each chunk is geocoded (equal addresses once), fetched with bounded parallelism and written to
+out/part-<chunk>.parquet, so memory does not grow with the input. Finished chunks are appended to
+out/_checkpoint, a run started again with the same arguments skips them. The parts read back as one dataset:
+pd.read_parquet("out/").
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from typing import Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas import DataFrame
+
+import config.settings
+from application.resources import Resources
+from config.metrics import Metrics
+from domain.facade.async_weather_facade import AsyncWeatherFacade
+from domain.models.location import Location
+from domain.services.open_meteo_service import OpenMeteoService
+
+location_columns = ["country", "city", "postal_code"]
+
+
+class BulkExport:
+    def __init__(self, input_path: str, output_dir: str, time_interval: str, duration: tuple,
+                 chunk_size: int = config.settings.bulk_chunk_size,
+                 weather_concurrency: int = config.settings.async_weather_concurrency,
+                 geocode_concurrency: int = config.settings.async_geocode_concurrency):
+        self.input_path = input_path
+        self.output_dir = output_dir
+        self.time_interval = time_interval
+        self.duration = duration
+        self.chunk_size = chunk_size
+        self.weather_concurrency = weather_concurrency
+        self.geocode_concurrency = geocode_concurrency
+        self.checkpoint_path = os.path.join(output_dir, "_checkpoint")
+        # One schema for every part from the configured variables, a part whose locations lack a variable or
+        # were not found at all still reads back together with the others
+        self.schema = pa.schema([("row", pa.int64()), *((name, pa.string()) for name in location_columns),
+                                 ("latitude", pa.float64()), ("longitude", pa.float64()),
+                                 ("timestamp", pa.timestamp("ns", tz="UTC")),
+                                 *((name, pa.float32()) for name in OpenMeteoService.columns(time_interval))])
+        self.logger = logging.getLogger(__name__)
+
+    def run(self) -> dict:
+        os.makedirs(self.output_dir, exist_ok=True)
+        done = self._load_checkpoint()
+        summary = {"chunks": 0, "skipped_chunks": 0, "locations": 0, "not_found": 0, "rows": 0}
+        asyncio.run(self._run(done=done, summary=summary))
+        return summary
+
+    async def _run(self, done: set[int], summary: dict) -> None:
+        async with AsyncWeatherFacade(api_name="open-meteo", weather_concurrency=self.weather_concurrency,
+                                      geocode_concurrency=self.geocode_concurrency) as facade:
+            with open(self.checkpoint_path, "a", encoding="utf-8") as checkpoint:
+                for number, rows in enumerate(self._read_chunks()):
+                    if number in done:
+                        summary["skipped_chunks"] += 1
+                        continue
+                    start = number * self.chunk_size
+                    locations = [Location(country=country, city=city, postal_code=postal_code)
+                                 for country, city, postal_code in rows.itertuples(index=False, name=None)]
+                    with Metrics.measure("bulk_chunk"):
+                        frames = await facade.get_weather_each(locations=locations, time_interval=self.time_interval,
+                                                               duration=self.duration)
+                        table = self._to_table(locations=locations, frames=frames, start=start)
+                        self._write_part(table=table, number=number)
+
+                    # The part is complete on disk before the chunk counts as done
+                    checkpoint.write(f"{number}\n")
+                    checkpoint.flush()
+                    os.fsync(checkpoint.fileno())
+
+                    not_found = sum(frame is None for frame in frames)
+                    summary["chunks"] += 1
+                    summary["locations"] += len(locations)
+                    summary["not_found"] += not_found
+                    summary["rows"] += table.num_rows
+                    if not_found:
+                        self.logger.warning(f"Chunk {number}: {not_found} locations not found")
+                    self.logger.info(f"Chunk {number} written, {summary['locations']} locations so far")
+
+    def _read_chunks(self) -> Iterator[DataFrame]:
+        """
+        Yields the location columns chunk_size rows at a time, missing columns are empty
+        """
+        if self.input_path.endswith(".parquet"):
+            parquet = pq.ParquetFile(self.input_path)
+            columns = [name for name in location_columns if name in parquet.schema_arrow.names]
+            chunks = (batch.to_pandas() for batch in parquet.iter_batches(batch_size=self.chunk_size,
+                                                                        columns=columns))
+        else:
+            chunks = pd.read_csv(self.input_path, chunksize=self.chunk_size, dtype=str, keep_default_na=False)
+
+        for chunk in chunks:
+            yield (chunk.reindex(columns=location_columns).fillna("").astype(str)
+                   .apply(lambda column: column.str.strip()))
+
+    def _to_table(self, locations: list[Location], frames: list[DataFrame | None], start: int) -> pa.Table:
+        parts = []
+        for i, (location, frame) in enumerate(zip(locations, frames)):
+            if frame is None:
+                continue
+            part = frame.reset_index()
+            # Written as plain columns, every row of the input stays identifiable in the dataset
+            part.insert(0, "row", start + i)
+            part.insert(1, "country", location.country)
+            part.insert(2, "city", location.city)
+            part.insert(3, "postal_code", location.postal_code)
+            part.insert(4, "latitude", location.coordinates.latitude)
+            part.insert(5, "longitude", location.coordinates.longitude)
+            parts.append(part)
+        if not parts:
+            return self.schema.empty_table()
+        df = pd.concat(parts, ignore_index=True).reindex(columns=self.schema.names)
+        return pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+
+    def _write_part(self, table: pa.Table, number: int) -> None:
+        name = f"part-{number:06d}.parquet"
+        # Written next to the final name and moved, a crash never leaves a half written part. The leading dot
+        # hides the temporary file from pd.read_parquet("out/")
+        tmp = os.path.join(self.output_dir, f".{name}.tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, os.path.join(self.output_dir, name))
+
+    def _load_checkpoint(self) -> set[int]:
+        """
+        Chunks finished by an earlier run with the same arguments, the first line records those arguments
+        """
+        header = json.dumps({"input": os.path.abspath(self.input_path), "chunk_size": self.chunk_size,
+                             "time_interval": self.time_interval, "duration": list(self.duration)})
+        if not os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "w", encoding="utf-8") as checkpoint:
+                checkpoint.write(header + "\n")
+            return set()
+
+        with open(self.checkpoint_path, encoding="utf-8") as checkpoint:
+            lines = checkpoint.read().splitlines()
+        if not lines or lines[0] != header:
+            raise ValueError(f"{self.checkpoint_path} belongs to a run with other arguments, "
+                             f"use another output directory or delete it")
+        return {int(line) for line in lines[1:] if line.strip()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV or Parquet file with country, city and postal_code")
+    parser.add_argument("output", help="directory for the Parquet parts and the checkpoint")
+    parser.add_argument("--interval", choices=["hours", "days"], default="hours")
+    parser.add_argument("--past-days", type=int, default=0)
+    parser.add_argument("--forecast-days", type=int, default=7)
+    parser.add_argument("--chunk-size", type=int, default=config.settings.bulk_chunk_size)
+    parser.add_argument("--weather-concurrency", type=int, default=config.settings.async_weather_concurrency)
+    parser.add_argument("--geocode-concurrency", type=int, default=config.settings.async_geocode_concurrency)
+    args = parser.parse_args()
+
+    Resources.setup_logging()
+    export = BulkExport(input_path=args.input, output_dir=args.output, time_interval=args.interval,
+                        duration=(-args.past_days, args.forecast_days), chunk_size=args.chunk_size,
+                        weather_concurrency=args.weather_concurrency, geocode_concurrency=args.geocode_concurrency)
+    print(json.dumps(export.run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import config.settings
+from config.metrics import Metrics
+from domain.facade.weather_facade import WeatherFacade
+from domain.models.location import Location
+from utils.normalization import Normalization
+
+
+class RequestBudget:
+    """
+    Token bucket over the upstream requests the scheduler may spend, refilled continuously
+    """
+
+    def __init__(self, per_hour: float, burst: int):
+        self.rate = per_hour / 3600
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """
+        Takes one token and returns 0, or returns the seconds until the next token is available
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            if self.rate <= 0:
+                return float("inf")
+            return (1 - self._tokens) / self.rate
+
+
+class PrewarmScheduler:
+    """
+    Keeps the forecasts of hot locations in the caches, so that no visitor waits for an upstream request.
+    Hot are the configured locations and those requested at least min_requests times, each one is refreshed
+    lead_time seconds before its forecast expires or right after a model update, whichever comes first.
+    """
+
+    def __init__(self, facade: WeatherFacade,
+                 locations: list[tuple] = config.settings.prewarm_locations,
+                 max_locations: int = config.settings.prewarm_max_locations,
+                 min_requests: int = config.settings.prewarm_min_requests,
+                 lead_time: float = config.settings.prewarm_lead_time,
+                 decay_period: float = config.settings.prewarm_decay_period,
+                 budget: RequestBudget = None):
+        self.facade = facade
+        self.max_locations = max_locations
+        self.min_requests = min_requests
+        self.lead_time = lead_time
+        self.decay_period = decay_period
+        self.budget = budget or RequestBudget(per_hour=config.settings.prewarm_budget_per_hour,
+                                              burst=config.settings.prewarm_budget_burst)
+        self._requests = Counter()
+        self._decayed = time.monotonic()
+        self._locations: dict[str, Location] = {}  # hot locations by normalized address
+        self._configured = set()
+        self._queue = []  # (run at, sequence, key, due), a key is queued at most once
+        self._sequence = itertools.count()
+        self._lag = 0.0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+        now = time.time()
+        with self._condition:
+            for country, city, postal_code in locations:
+                key = self._add(Location(country=country, city=city, postal_code=postal_code), due=now)
+                self._configured.add(key)
+
+    def start(self) -> None:
+        with self._condition:
+            if self._thread is None:
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name="prewarm", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def track(self, location: Location, time_interval: str, duration: int) -> None:
+        """
+        Request listener of the facade, a location becomes hot with its min_requests-th request
+        """
+        key = Normalization.normalize_address(location)
+        with self._condition:
+            self._decay()
+            self._requests[key] += 1
+            if len(self._requests) > 10 * self.max_locations:
+                # Halving keeps the counter bounded
+                self._requests = Counter({k: n // 2 for k, n in self._requests.items() if n > 1})
+            if (key not in self._locations and self._requests[key] >= self.min_requests
+                    and len(self._locations) < self.max_locations):
+                # It has just been fetched, so the first refresh is due before that forecast expires
+                self._add(Location(country=location.country, city=location.city, postal_code=location.postal_code),
+                          due=time.time() + config.settings.expiration_cache - self.lead_time)
+
+    def stats(self) -> dict:
+        with self._condition:
+            now = time.time()
+            overdue = [due for run_at, _, _, due in self._queue if run_at <= now]
+            return {
+                "locations": len(self._locations),
+                "queue_depth": len(overdue),
+                "lag_seconds": round(now - min(overdue), 3) if overdue else 0.0,
+                "last_lag_seconds": round(self._lag, 3),
+                "next_due_in_seconds": round(self._queue[0][0] - now, 3) if self._queue else None,
+            }
+
+    def _add(self, location: Location, due: float) -> str:
+        # Called with the condition held
+        key = Normalization.normalize_address(location)
+        self._locations[key] = location
+        heapq.heappush(self._queue, (due, next(self._sequence), key, due))
+        self._condition.notify_all()
+        return key
+
+    def _decay(self) -> None:
+        """
+        Halves the request counts once per decay_period, called with the condition held. A location that is no
+        longer requested falls below min_requests within a few periods and is dropped at its next refresh.
+        """
+        periods = int((time.monotonic() - self._decayed) // self.decay_period)
+        if periods:
+            shift = min(periods, 62)
+            self._requests = Counter({k: n >> shift for k, n in self._requests.items() if n >> shift})
+            self._decayed += periods * self.decay_period
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped and (not self._queue or self._queue[0][0] > time.time()):
+                    timeout = self._queue[0][0] - time.time() if self._queue else None
+                    self._condition.wait(timeout=timeout)
+                if self._stopped:
+                    return
+                _, _, key, due = heapq.heappop(self._queue)
+                location = self._locations.get(key)
+                if location is None:
+                    continue
+                self._decay()
+                if key not in self._configured and self._requests[key] < self.min_requests:
+                    # Cooled down, it is learned again once it is requested often enough
+                    del self._locations[key]
+                    continue
+
+                wait = self.budget.try_acquire()
+                if wait:
+                    Metrics.count("prewarm_deferred")
+                    # Deferred entries keep their due time, the lag shows how far the budget is behind
+                    heapq.heappush(self._queue, (time.time() + wait, next(self._sequence), key, due))
+                    continue
+
+            self._lag = time.time() - due
+            if Metrics.enabled:
+                Metrics.observe("prewarm_lag", max(self._lag, 0.0))
+            next_due = self._refresh(location=location)
+            with self._condition:
+                heapq.heappush(self._queue, (next_due, next(self._sequence), key, next_due))
+
+    def _refresh(self, location: Location) -> float:
+        """
+        Refreshes the forecast of one location and returns when it is due next
+        """
+        try:
+            with Metrics.measure("prewarm"):
+                df = self.facade.refresh_weather(location=location,
+                                                 time_interval=config.settings.prewarm_time_interval,
+                                                 duration=config.settings.prewarm_duration)
+            Metrics.count("prewarm_refreshes")
+        except Exception as e:
+            Metrics.count("prewarm_failures")
+            logging.getLogger(__name__).warning(f"Pre-warming {location.city} failed: {e}")
+            return time.time() + config.settings.prewarm_retry_delay
+
+        fetched_at = df.attrs.get("fetched_at", time.time()) if df is not None else time.time()
+        expires = fetched_at + config.settings.expiration_cache - self.lead_time
+        return max(min(expires, self._next_model_update(after=fetched_at)), time.time())
+
+    @staticmethod
+    def _next_model_update(after: float) -> float:
+        """
+        First time after the given one at which the forecast of a new model run is available
+        """
+        day = datetime.fromtimestamp(after, tz=timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        delay = timedelta(seconds=config.settings.prewarm_model_update_delay)
+        # The delay can push a run into the next day, so yesterday's runs are candidates as well
+        updates = (day + timedelta(days=offset, hours=hour) + delay
+                   for offset in (-1, 0, 1) for hour in config.settings.prewarm_model_update_hours)
+        return min(update.timestamp() for update in updates if update.timestamp() > after)
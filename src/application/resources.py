@@ -0,0 +1,61 @@
+import atexit
+import threading
+
+import config.settings
+from application.prewarm_scheduler import PrewarmScheduler
+from config.logging_config import setup_logging
+from domain.facade.weather_facade import WeatherFacade
+
+
+class Resources:
+    """
+    Process wide resources shared by every Streamlit session and thread.
+    Streamlit reruns the whole script on each interaction, building a facade each time would reopen the
+    cache sessions, the Nominatim client and the log handlers before any work is done.
+    """
+
+    _lock = threading.Lock()
+    _facades: dict[str, WeatherFacade] = {}
+    _schedulers: dict[str, PrewarmScheduler] = {}
+    _logging_ready = False
+
+    @classmethod
+    def setup_logging(cls) -> None:
+        with cls._lock:
+            if not cls._logging_ready:
+                setup_logging()
+                cls._logging_ready = True
+
+    @classmethod
+    def get_facade(cls, api_name: str) -> WeatherFacade:
+        facade = cls._facades.get(api_name)
+        if facade is None:
+            with cls._lock:
+                facade = cls._facades.get(api_name)
+                if facade is None:
+                    facade = WeatherFacade(api_name=api_name)
+                    if config.settings.prewarm_enabled:
+                        scheduler = PrewarmScheduler(facade=facade)
+                        facade.request_listeners.append(scheduler.track)
+                        scheduler.start()
+                        cls._schedulers[api_name] = scheduler
+                    cls._facades[api_name] = facade
+        return facade
+
+    @classmethod
+    def get_scheduler(cls, api_name: str) -> PrewarmScheduler | None:
+        return cls._schedulers.get(api_name)
+
+    @classmethod
+    def shutdown(cls) -> None:
+        with cls._lock:
+            # The schedulers go first, they still use the facades
+            for scheduler in cls._schedulers.values():
+                scheduler.stop()
+            cls._schedulers.clear()
+            for facade in cls._facades.values():
+                facade.close()
+            cls._facades.clear()
+
+
+atexit.register(Resources.shutdown)
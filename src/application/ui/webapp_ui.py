@@ -3,9 +3,13 @@ import plotly.express as px
 import streamlit as st
 
 import config.settings
-from config.logging_config import debug_log, setup_logging
-from domain.facade.weather_facade import WeatherFacade
+from application.resources import Resources
+from config.logging_config import debug_log
+from config.metrics import Metrics, timed
 from domain.models.location import Location
+from domain.models.weather_frame import WeatherFrame
+from domain.services.export_service import ExportService, export_formats
+from utils.downsampling import Downsampling
 
 
 class WebappUI:
@@ -15,14 +19,15 @@ class WebappUI:
     """
 
     def __init__(self):
-        setup_logging()
-        self.facade = WeatherFacade(api_name="open-meteo")
+        Resources.setup_logging()
+        self.facade = Resources.get_facade(api_name="open-meteo")
         st.set_page_config(layout="wide")  # this has to be the first st in the entire document?
         self._initialize_session()
 
     @debug_log
     def _initialize_session(self) -> None:
         st.session_state.setdefault("df", None)
+        st.session_state.setdefault("frame", None)
         st.session_state.setdefault("location", None)
         st.session_state.setdefault("current_page", "summary")
         st.session_state.setdefault("time_interval", "Days")
@@ -73,17 +78,34 @@ class WebappUI:
 
             if st.session_state.df is not None:
                 df = st.session_state.df
-                csv = df.to_csv(index=False).encode("utf-8")
+                export_format = st.selectbox("Export Format", list(export_formats), format_func=str.upper)
+                mime, extension = export_formats[export_format]
                 st.download_button(
-                    label="Download CSV",
-                    data=csv,
-                    file_name="data.csv",
-                    mime="text/csv",
+                    label=f"Download {export_format.upper()}",
+                    data=self._export(fingerprint=self._frame_fingerprint(df=df), export_format=export_format,
+                                      _df=df),
+                    file_name=f"data.{extension}",
+                    mime=mime,
                     icon=":material/download:",
+                    on_click="ignore",
                 )
 
             self._refresh_data_automatically(duration=duration)
 
+            if st.query_params.get("debug") == "1":
+                self._debug_panel()
+
+    @debug_log
+    def _debug_panel(self) -> None:
+        with st.expander("Debug :stopwatch:", expanded=False):
+            st.json({
+                "metrics": Metrics.snapshot(),
+                "geocode_cache": self.facade.geocode_cache.stats(),
+                "frame_cache": self.facade.cache.frame_cache.stats(),
+                "prewarm": scheduler.stats() if (scheduler := Resources.get_scheduler(api_name="open-meteo")) else None,
+            })
+            st.code(Metrics.to_prometheus(), language="text")
+
     @debug_log
     def _page_controls(self):
         col1, col2 = st.columns(2)
@@ -159,6 +181,7 @@ class WebappUI:
             )
             df = df.reset_index()
             st.session_state.df = df
+            st.session_state.frame = WeatherFrame.from_dataframe(df=df)
 
             st.session_state.last_fetch_params = {
                 "time_interval": time_interval,
@@ -171,19 +194,29 @@ class WebappUI:
     @debug_log
     def _display_summary(self):
         st.subheader(f"Weather Summary {st.session_state.time_interval}")
+        self._display_data_age()
 
         if st.session_state.time_interval == "Days":
             self._display_daily_summary()
         else:
             self._display_hourly_summary()
 
+    @debug_log
+    def _display_data_age(self) -> None:
+        fetched_at = st.session_state.df.attrs.get("fetched_at")
+        if fetched_at is None:
+            return
+        fetched = pd.Timestamp(fetched_at, unit="s", tz="Europe/Berlin")
+        age = int((pd.Timestamp.now(tz="Europe/Berlin") - fetched).total_seconds() // 60)
+        st.caption(f"Data from {fetched:%H:%M} ({age} min old)")
+
     @debug_log
     def _display_daily_summary(self):
-        df = st.session_state.df
+        frame = st.session_state.frame
         # st.dataframe(df, use_container_width=True)
 
         with st.expander("Today's Weather :rainbow:", expanded=True):
-            current_value = self._get_current(df=df)
+            current_value = frame.current()
             cols = st.columns(3)
             with cols[0]:
                 st.metric("Temperature :thermometer:",
@@ -211,31 +244,31 @@ class WebappUI:
         with st.expander(label="Temperature :thermometer:", expanded=True):
             cols = st.columns(3)
             with cols[0]:
-                st.metric("Lowest Temperature :snowflake:", f"{df['temperature_2m_min'].min():.1f}°C")
+                st.metric("Lowest Temperature :snowflake:", f"{frame.stat('temperature_2m_min', 'min'):.1f}°C")
             with cols[1]:
-                st.metric("Average Temperature :dart:", f"{df['temperature_2m_mean'].mean():.1f}°C")
+                st.metric("Average Temperature :dart:", f"{frame.stat('temperature_2m_mean', 'mean'):.1f}°C")
             with cols[2]:
-                st.metric("Max Temperature :fire:", f"{df['temperature_2m_max'].max():.1f}°C")
+                st.metric("Max Temperature :fire:", f"{frame.stat('temperature_2m_max', 'max'):.1f}°C")
 
         with st.expander(label="Wind :wind_blowing_face:", expanded=True):
             cols = st.columns(3)
             with cols[0]:
-                st.metric("Slowest Wind Speed", f"{df['wind_speed_10m_min'].min():.1f} km/h")
-                st.metric("Slowest Wind Gusts", f"{df['wind_gust_10m_min'].min():.1f} km/h")
+                st.metric("Slowest Wind Speed", f"{frame.stat('wind_speed_10m_min', 'min'):.1f} km/h")
+                st.metric("Slowest Wind Gusts", f"{frame.stat('wind_gust_10m_min', 'min'):.1f} km/h")
             with cols[1]:
-                st.metric("Average Wind Speed", f"{df['wind_speed_10m_mean'].mean():.1f} km/h")
-                st.metric("Average Wind Gusts", f"{df['wind_gust_10m_mean'].mean():.1f} km/h")
+                st.metric("Average Wind Speed", f"{frame.stat('wind_speed_10m_mean', 'mean'):.1f} km/h")
+                st.metric("Average Wind Gusts", f"{frame.stat('wind_gust_10m_mean', 'mean'):.1f} km/h")
             with cols[2]:
-                st.metric("Fastest Wind Speed", f"{df['wind_speed_10m_max'].max():.1f} km/h")
-                st.metric("Fastest Wind Gusts", f"{df['wind_gust_10m_max'].max():.1f} km/h")
+                st.metric("Fastest Wind Speed", f"{frame.stat('wind_speed_10m_max', 'max'):.1f} km/h")
+                st.metric("Fastest Wind Gusts", f"{frame.stat('wind_gust_10m_max', 'max'):.1f} km/h")
 
     @debug_log
     def _display_hourly_summary(self):
-        df = st.session_state.df
+        frame = st.session_state.frame
         # st.dataframe(df, use_container_width=True)
 
         with st.expander("Current Weather :rainbow:", expanded=True):
-            current_value = self._get_current(df=df)
+            current_value = frame.current()
             cols = st.columns(3)
             with cols[0]:
                 st.metric("Temperature :thermometer:", f"{current_value['temperature_2m']:.1f}°C")
@@ -256,23 +289,23 @@ class WebappUI:
         with st.expander(label="Temperature :thermometer:", expanded=True):
             cols = st.columns(3)
             with cols[0]:
-                st.metric("Lowest Temperature :snowflake:", f"{df['temperature_2m'].min():.1f}°C")
+                st.metric("Lowest Temperature :snowflake:", f"{frame.stat('temperature_2m', 'min'):.1f}°C")
             with cols[1]:
-                st.metric("Average Temperature :dart:", f"{df['temperature_2m'].mean():.1f}°C")
+                st.metric("Average Temperature :dart:", f"{frame.stat('temperature_2m', 'mean'):.1f}°C")
             with cols[2]:
-                st.metric("Max Temperature :fire:", f"{df['temperature_2m'].max():.1f}°C")
+                st.metric("Max Temperature :fire:", f"{frame.stat('temperature_2m', 'max'):.1f}°C")
 
         with st.expander(label="Wind :wind_blowing_face:", expanded=True):
             cols = st.columns(3)
             with cols[0]:
-                st.metric("Slowest Wind Speed", f"{df['wind_speed_10m'].min():.1f} km/h")
-                st.metric("Slowest Wind Gusts", f"{df['wind_gust_10m'].min():.1f} km/h")
+                st.metric("Slowest Wind Speed", f"{frame.stat('wind_speed_10m', 'min'):.1f} km/h")
+                st.metric("Slowest Wind Gusts", f"{frame.stat('wind_gust_10m', 'min'):.1f} km/h")
             with cols[1]:
-                st.metric("Average Wind Speed", f"{df['wind_speed_10m'].mean():.1f} km/h")
-                st.metric("Average Wind Gusts", f"{df['wind_gust_10m'].mean():.1f} km/h")
+                st.metric("Average Wind Speed", f"{frame.stat('wind_speed_10m', 'mean'):.1f} km/h")
+                st.metric("Average Wind Gusts", f"{frame.stat('wind_gust_10m', 'mean'):.1f} km/h")
             with cols[2]:
-                st.metric("Fastest Wind Speed", f"{df['wind_speed_10m'].max():.1f} km/h")
-                st.metric("Fastest Wind Gusts", f"{df['wind_gust_10m'].max():.1f} km/h")
+                st.metric("Fastest Wind Speed", f"{frame.stat('wind_speed_10m', 'max'):.1f} km/h")
+                st.metric("Fastest Wind Gusts", f"{frame.stat('wind_gust_10m', 'max'):.1f} km/h")
 
     @debug_log
     def _display_details(self):
@@ -288,7 +321,7 @@ class WebappUI:
         # st.dataframe(df, use_container_width=True)
 
         # Tabs with loop-based plotting
-        tabs = st.tabs(["Temperature", "Precipitation", "Wind", "Visibility & Clouds", "Wind Gusts"])
+        tabs = ["Temperature", "Precipitation", "Wind", "Visibility & Clouds", "Wind Gusts"]
         plots = [
             {"tab": 0, "title": "Temperature Over Time",
              "cols": ['temperature_2m_min', 'temperature_2m_max', 'temperature_2m_mean'],
@@ -315,7 +348,7 @@ class WebappUI:
         df = st.session_state.df
         # st.dataframe(df, use_container_width=True)
 
-        tabs = st.tabs(["Temperature", "Precipitation", "Wind", "Visibility & Clouds", "Wind Gusts"])
+        tabs = ["Temperature", "Precipitation", "Wind", "Visibility & Clouds", "Wind Gusts"]
         plots = [
             {"tab": 0, "title": "Temperature vs Apparent Temperature",
              "cols": ['temperature_2m', 'apparent_temperature_2m'],
@@ -339,38 +372,6 @@ class WebappUI:
 
         self._plot_data(df, tabs, plots)
 
-    @debug_log
-    def _get_current(self, df):
-        # Work on a copy and ensure timestamps are parsed
-        df = df.copy()
-        df["timestamp"] = pd.to_datetime(df["timestamp"])  # Result looks the same, modern Python uses types
-        timestamps = df["timestamp"]
-
-        # Keep timezone if present
-        now = pd.Timestamp.now(tz=timestamps.dt.tz)
-
-        # Daily
-        if timestamps.dt.hour.nunique() == 1:
-            today = now.normalize()
-            is_today = timestamps.dt.normalize() == today
-            if is_today.any():
-                # If today is found, use today
-                return df.loc[is_today].iloc[0]
-            else:
-                # Fallback, just take the last available day if you can not find today
-                past = df[timestamps <= now]
-                if not past.empty:
-                    return past.iloc[-1]
-                '''
-                Before the front-end crashes just return the first row of the dataset.
-                This should never be executed as long as the backend is not faulty
-                '''
-                return df.iloc[0]
-        else:  # Hourly
-            df["time_diff"] = (timestamps - now).abs()
-            best_idx = df["time_diff"].idxmin()
-            return df.loc[best_idx]
-
     @debug_log
     def _get_wind_direction(self, degree):
         directions = [
@@ -383,28 +384,70 @@ class WebappUI:
         index = int((normalized_degree + 11.25) / 22.5) % 16
         return directions[index]
 
+    @timed("render")
     @debug_log
     def _plot_data(self, df, tabs, plots):
+        """
+        st.tabs would send the figures of every tab on each rerun, only the selected one is rendered here
+        """
+        tab = st.radio("Chart", options=range(len(tabs)), format_func=lambda i: tabs[i], horizontal=True,
+                       key="details_tab", label_visibility="collapsed")
+        fingerprint = self._frame_fingerprint(df=df)
         for spec in plots:
-            with tabs[spec['tab']]:
-                with st.expander(label=spec['title'], expanded=True):
-                    st.header(spec['title'])
-                    kind = spec.get('kind', 'line')
-                    fig = (
-                        px.bar(df, x='timestamp', y=spec['cols'], title=spec['title'],
-                               labels={'value': spec['y_label']})
-                        if kind == 'bar'
-                        else px.line(df, x='timestamp', y=spec['cols'], title=spec['title'],
-                                     labels={'value': spec['y_label']})
-                    )
-                    fig.update_layout(
-                        hovermode='x unified',
-                        legend_title=None,
-                        margin=dict(t=40, r=20, l=20, b=20)
-                    )
-                    fig.update_xaxes(rangeslider_visible=True)
-                    st.plotly_chart(fig, use_container_width=True)
+            if spec['tab'] != tab:
+                continue
+            with st.expander(label=spec['title'], expanded=True):
+                st.header(spec['title'])
+                fig = self._build_figure(fingerprint=fingerprint, spec=spec,
+                                         max_points=config.settings.plot_max_points, _df=df)
+                st.plotly_chart(fig, use_container_width=True)
+
+    @staticmethod
+    def _frame_fingerprint(df) -> tuple:
+        """
+        Cheap identity of the fetched data, cached frames carry their fetch time, others are hashed
+        """
+        fetched_at = df.attrs.get("fetched_at")
+        if fetched_at is None or df.empty:
+            return "hash", int(pd.util.hash_pandas_object(df, index=False).sum())
+        return fetched_at, len(df), tuple(df.columns), df['timestamp'].iloc[0], df['timestamp'].iloc[-1]
+
+    @staticmethod
+    @st.cache_resource(max_entries=32, show_spinner=False)
+    def _export(fingerprint, export_format, _df) -> bytes:
+        """
+        Serialized once per frame version and format, reruns only look the bytes up
+        """
+        return ExportService.to_bytes(df=_df, export_format=export_format)
 
+    @staticmethod
+    @st.cache_resource(max_entries=config.settings.plot_figure_cache_size, show_spinner=False)
+    def _build_figure(fingerprint, spec, max_points, _df):
+        """
+        Figures are shared by every session showing the same data, the frame itself is not hashed (_df)
+        """
+        Metrics.count("figure_builds")
+        kind = spec.get('kind', 'line')
+        df = _df
+        if kind == 'line' and max_points and len(df) > max_points:
+            keep = Downsampling.lttb_columns(x=df['timestamp'].to_numpy(dtype="int64"),
+                                             columns=[df[col].to_numpy() for col in spec['cols']],
+                                             threshold=max_points)
+            df = df.iloc[keep]
+        fig = (
+            px.bar(df, x='timestamp', y=spec['cols'], title=spec['title'],
+                   labels={'value': spec['y_label']})
+            if kind == 'bar'
+            else px.line(df, x='timestamp', y=spec['cols'], title=spec['title'],
+                         labels={'value': spec['y_label']})
+        )
+        fig.update_layout(
+            hovermode='x unified',
+            legend_title=None,
+            margin=dict(t=40, r=20, l=20, b=20)
+        )
+        fig.update_xaxes(rangeslider_visible=True)
+        return fig
 
 if __name__ == "__main__":
     app = WebappUI()
@@ -0,0 +1,127 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from config.settings import metrics_enabled
+
+# Upper bounds of the latency histogram buckets in seconds, the last bucket is +Inf
+buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    Process wide wall time histograms per stage and plain counters.
+    Disabled metrics cost one attribute lookup per call, nothing is recorded.
+    """
+
+    enabled = metrics_enabled
+    _lock = threading.Lock()
+    _histograms: dict[str, _Histogram] = {}
+    _counters: dict[str, int] = {}
+
+    @classmethod
+    def observe(cls, stage: str, seconds: float) -> None:
+        with cls._lock:
+            histogram = cls._histograms.get(stage)
+            if histogram is None:
+                histogram = cls._histograms[stage] = _Histogram()
+            histogram.observe(seconds)
+
+    @classmethod
+    def count(cls, name: str, value: int = 1) -> None:
+        if not cls.enabled:
+            return
+        with cls._lock:
+            cls._counters[name] = cls._counters.get(name, 0) + value
+
+    @classmethod
+    @contextmanager
+    def measure(cls, stage: str):
+        if not cls.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.observe(stage, time.perf_counter() - start)
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls._lock:
+            cls._histograms.clear()
+            cls._counters.clear()
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        with cls._lock:
+            return {
+                "counters": dict(cls._counters),
+                "histograms": {
+                    stage: {
+                        "count": histogram.count,
+                        "sum": histogram.total,
+                        "buckets": dict(zip([str(bound) for bound in buckets] + ["+Inf"], histogram.counts)),
+                    }
+                    for stage, histogram in cls._histograms.items()
+                },
+            }
+
+    @classmethod
+    def to_json(cls) -> str:
+        return json.dumps(cls.snapshot(), indent=2)
+
+    @classmethod
+    def to_prometheus(cls) -> str:
+        snapshot = cls.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE weather_app_{name}_total counter")
+            lines.append(f"weather_app_{name}_total {value}")
+
+        lines.append("# TYPE weather_app_stage_seconds histogram")
+        for stage, histogram in sorted(snapshot["histograms"].items()):
+            cumulative = 0
+            for bound, count in histogram["buckets"].items():
+                cumulative += count
+                lines.append(f'weather_app_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'weather_app_stage_seconds_sum{{stage="{stage}"}} {histogram["sum"]}')
+            lines.append(f'weather_app_stage_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+        return "\n".join(lines) + "\n"
+
+
+def timed(stage: str):
+    """
+    Records the wall time of every call in the histogram of the given stage
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not Metrics.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                Metrics.observe(stage, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
@@ -1,16 +1,134 @@
+import os
+
 # Agent used for Api-Calls
 agent_name = "Weather_App_Fiedler"
 
+# Upstream services, the environment variables point them at a local stand-in (see benchmarks/stub_server.py)
+open_meteo_forecast_url = os.getenv("OPEN_METEO_FORECAST_URL", "https://api.open-meteo.com/v1/forecast")
+open_meteo_archive_url = os.getenv("OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/archive")
+nominatim_domain = os.getenv("NOMINATIM_DOMAIN", "nominatim.openstreetmap.org")
+nominatim_scheme = os.getenv("NOMINATIM_SCHEME", "https")
+
 # Caching Strategy
 cache_name = ".cache"
 expiration_cache = 3600
 retries_cache = 5
 backoff_factor_cache = 0.2
+# Http cache backend: "memory", "filesystem", "sqlite" or "redis" (any server speaking the redis protocol)
+cache_backend = os.getenv("CACHE_BACKEND", "sqlite")
+cache_redis_url = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+cache_max_entries = 5000
+cache_purge_interval = 300  # seconds between two removals of expired responses, 0 disables the job
+
+# Stale-while-revalidate: expired forecasts younger than expiration_cache + stale_while_revalidate seconds are
+# returned right away and refreshed in the background, older ones are fetched while the caller waits
+stale_while_revalidate = 6 * 3600
+stale_refresh_workers = 2
+
+# Cache of decoded DataFrames in front of the http cache, spill_dir = None keeps it in memory only
+frame_cache_max_bytes = 256 * 1024 * 1024
+frame_cache_spill_dir = None  # e.g. ".frame_cache", needs pyarrow
+
+# Concurrent identical geocoding and forecast requests wait for one upstream call, "memory" coalesces them per
+# process, "file" across all processes sharing single_flight_lock_dir (needs fcntl)
+single_flight = os.getenv("SINGLE_FLIGHT", "memory")
+single_flight_lock_dir = ".locks"
+single_flight_lock_stripes = 256
+single_flight_timeout = 60  # seconds a caller waits for another one before it fetches on its own
+
+# Append-only store of final past days (Arrow files per location cell and day), an empty dir disables it.
+# A day counts as final time_series_final_delay seconds after it ended, until then it is requested again
+time_series_store_dir = os.getenv("TIME_SERIES_STORE_DIR", ".timeseries")
+time_series_final_delay = 6 * 3600
+
+# Connection pool of the shared http session, maxsize is the number of parallel requests per host
+http_pool_connections = 10
+http_pool_maxsize = 20
+
+# Geocoding Cache
+geocode_cache_name = ".geocode_cache.sqlite"
+geocode_expiration = 30 * 24 * 3600  # coordinates of an address hardly ever change
+geocode_negative_expiration = 24 * 3600  # "Location not found" is only remembered for a day
+geocode_memory_size = 1024
+
+# Geocoder: "nominatim" or "gazetteer", a local GeoNames postal code dump prebuilt into gazetteer_index_path with
+# python -m application.cli.build_gazetteer. Addresses missing in the gazetteer are still asked from Nominatim
+geocoder = os.getenv("GEOCODER", "nominatim")
+gazetteer_index_path = os.getenv("GAZETTEER_INDEX", ".gazetteer.pickle")
+gazetteer_min_prefix = 3  # shorter unknown place names are not completed
+gazetteer_prefix_candidates = 100  # names starting with the given one compared for the shortest
+gazetteer_reverse_max_distance = 30  # km, reverse lookups farther from any place find nothing
+
+# Batch requests, open-meteo accepts up to 1000 coordinates but the url has to stay below ~8 KB
+batch_max_locations = 100
+batch_max_coordinates_length = 6000
+
+# Nominatim only allows about one request per second, geocoding requests are spaced by at least this many seconds.
+# 0 disables the spacing, only for stand-ins such as the stub server
+nominatim_min_delay = float(os.getenv("NOMINATIM_MIN_DELAY", "1.0"))
+
+# Async pipeline
+async_connection_limit = 20
+async_weather_concurrency = 10
+async_geocode_concurrency = 1
+async_timeout = 30
+
+# The daily view is aggregated from the cached hourly data instead of fetching daily_params separately.
+# Off until tests/test_daily_aggregation.py passes against a recorded pair of responses
+# (python benchmarks/flatbuffer_fixtures.py --record), the checked-in fixtures are synthetic
+derive_daily_from_hourly = os.getenv("DERIVE_DAILY_FROM_HOURLY", "0") == "1"
+
+# Coordinates are snapped to the upstream model grid before caching and fetching, so that nearby addresses within
+# one grid cell share a forecast. A step in degrees, a model of model_grids or None ("" or "none") for the exact
+# coordinates
+coordinate_grid = os.getenv("COORDINATE_GRID", "icon_d2")
+model_grids = {"icon_d2": 0.02, "icon_eu": 0.0625, "icon_global": 0.125, "ecmwf_ifs025": 0.25, "gfs025": 0.25}
+
+# Pre-warming of hot locations: configured ones (prewarm_locations) and those requested at least prewarm_min_requests
+# times are refreshed in the background shortly before their forecast expires or right after a model update
+prewarm_enabled = os.getenv("PREWARM_ENABLED", "1") == "1"
+prewarm_max_locations = 300
+prewarm_min_requests = 3
+prewarm_decay_period = 6 * 3600  # request counts are halved every period, locations no longer requested cool down
+prewarm_lead_time = 300  # seconds before expiry
+prewarm_model_update_hours = (0, 6, 12, 18)  # model runs in UTC
+prewarm_model_update_delay = 2 * 3600 + 1800  # open-meteo publishes a run roughly 2.5 hours after its start
+prewarm_budget_per_hour = 600  # upstream requests the scheduler may spend, shared by all hot locations
+prewarm_budget_burst = 10
+prewarm_retry_delay = 300
+# The widest span the UI offers, the range planner slices every narrower request and the daily view out of it
+prewarm_time_interval = "hours"
+prewarm_duration = (-7, 7)
+
+# Headless HTTP service (application/api), calls above api_max_pending are rejected with 503
+api_host = os.getenv("API_HOST", "127.0.0.1")
+api_port = int(os.getenv("API_PORT", "8000"))
+api_workers = 16
+api_max_pending = 256
+api_timeout = 30
+api_max_batch_locations = 1000
+
+# Bulk export CLI (application/cli), locations per input chunk and Parquet part
+bulk_chunk_size = 500
+
+# Historical archive ("open-meteo-archive"), long ranges are fetched as parallel requests of archive_chunk_days
+archive_chunk_days = 366
+archive_workers = 4
+archive_delay_days = 5  # the reanalysis lags a few days behind today
+
+# Stage timings and cache counters, the debug panel is shown with ?debug=1 in the url
+metrics_enabled = True
+
+# Line charts with more points are downsampled (LTTB) before they are sent to the browser, None sends all of them
+plot_max_points = 1000
+plot_figure_cache_size = 256  # figures shared by all sessions
 
 # Default UI Values
 default_country = "Germany"
 default_city = "Saarbrücken"
 default_postal_code = "66111"
+# Always kept warm by the pre-warming scheduler as (country, city, postal code)
+prewarm_locations = [(default_country, default_city, default_postal_code)]
 
 # Parameters used for open-meteo, modifying those will most likely break the code. I will not fix any errors occurring because of this!
 daily_params = ["temperature_2m_max", "temperature_2m_min", "weather_code", "apparent_temperature_max",
@@ -24,6 +142,15 @@ hourly_params = ["temperature_2m", "weather_code", "apparent_temperature", "rela
                  "showers", "rain", "cloud_cover_low", "cloud_cover_mid", "cloud_cover_high", "cloud_cover",
                  "visibility", "wind_speed_10m", "wind_direction_10m", "wind_gusts_10m"]
 
+# The archive has no showers and no visibility, otherwise the same variables as above
+archive_daily_params = ["temperature_2m_max", "temperature_2m_min", "weather_code", "apparent_temperature_max",
+                        "apparent_temperature_min", "apparent_temperature_mean", "temperature_2m_mean",
+                        "rain_sum", "snowfall_sum", "wind_speed_10m_max", "wind_direction_10m_dominant",
+                        "wind_gusts_10m_max"]
+archive_hourly_params = ["temperature_2m", "weather_code", "apparent_temperature", "relative_humidity_2m",
+                         "snowfall", "rain", "cloud_cover_low", "cloud_cover_mid", "cloud_cover_high", "cloud_cover",
+                         "wind_speed_10m", "wind_direction_10m", "wind_gusts_10m"]
+
 # Shortcodes used by Streamlit for the Weather
 weather_emojis = {
     0: ":sunny:",
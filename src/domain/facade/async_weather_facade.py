@@ -0,0 +1,186 @@
+import asyncio
+
+import aiohttp
+import pandas as pd
+from pandas import DataFrame
+
+from config.logging_config import debug_log
+from config.settings import (async_connection_limit, async_weather_concurrency, async_geocode_concurrency,
+                             async_timeout, agent_name, open_meteo_forecast_url)
+from domain.factory.weather_client_factory import WeatherClientFactory
+from domain.models.cache_strategy import CacheStrategy
+from domain.models.gazetteer import Gazetteer
+from domain.models.geocode_cache import GeocodeCache
+from domain.models.location import Location, LocationNotFoundError
+from domain.services.open_meteo_service import _exact_coordinates
+from infrastructure.api_clients.geopy_async_api import AsyncGeoLocationClient
+from infrastructure.api_clients.open_meteo_async_api import AsyncOpenMeteoClient
+from utils.normalization import Normalization
+from utils.validation import Validation
+
+
+class AsyncWeatherFacade:
+    """
+    Async counterpart of WeatherFacade for many locations at once. Geocoding and weather requests run
+    concurrently on one pooled aiohttp session, parameters and decoding are taken from the weather service.
+    Frames are shared with the frame cache of the weather service, only the uncached grid cells are requested.
+    The service and the caches are opened when the context is entered and closed when it is left.
+
+        async with AsyncWeatherFacade(api_name="open-meteo") as facade:
+            df = await facade.get_weather_many(locations, time_interval="hours", duration=(-1, 7))
+    """
+
+    def __init__(self, api_name, weather_concurrency: int = async_weather_concurrency,
+                 geocode_concurrency: int = async_geocode_concurrency):
+        self.api_name = api_name
+        self.gazetteer = Gazetteer.create()
+        self.weather_concurrency = weather_concurrency
+        self.geocode_concurrency = geocode_concurrency
+
+        self.cache = None
+        self.weather_service = None
+        self.geocode_cache = None
+        self.session = None
+        self.geo_client = None
+        self.weather_client = None
+        self._weather_semaphore = None
+        self._geocode_semaphore = None
+
+    async def __aenter__(self):
+        self.cache = CacheStrategy()
+        self.weather_service = WeatherClientFactory.create_client(api_name=self.api_name, cache=self.cache)
+        self.geocode_cache = GeocodeCache()
+        connector = aiohttp.TCPConnector(limit=async_connection_limit)
+        self.session = aiohttp.ClientSession(connector=connector, headers={"User-Agent": agent_name},
+                                             timeout=aiohttp.ClientTimeout(total=async_timeout))
+        self.weather_client = AsyncOpenMeteoClient(session=self.session)
+        self.geo_client = await AsyncGeoLocationClient(cache=self.geocode_cache).__aenter__()
+        # Semaphores belong to the running event loop, so they are created here and not in __init__
+        self._weather_semaphore = asyncio.Semaphore(self.weather_concurrency)
+        self._geocode_semaphore = asyncio.Semaphore(self.geocode_concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.geo_client.__aexit__(exc_type, exc_value, traceback)
+        await self.session.close()
+        self.session = None
+        # The refresher pool, the purger thread and the cache connections of this context
+        self.weather_service.close()
+        self.cache.close()
+        self.geocode_cache.close()
+
+    @debug_log
+    async def get_weather(self, location: Location, time_interval: str, duration: int) -> DataFrame | None:
+        try:
+            await self._resolve(location=location)
+            frames = await self._fetch_frames(locations=[location], time_interval=time_interval, duration=duration)
+            return frames[0]
+        except LocationNotFoundError as e:
+            raise LocationNotFoundError(f"Error: {str(e)}")
+        except Exception as e:
+            raise ValueError(f"Error: {str(e)}")
+
+    @debug_log
+    async def get_weather_many(self, locations: list[Location], time_interval: str,
+                               duration: int) -> DataFrame | None:
+        """
+        Same result as WeatherFacade.get_weather_batch, but the chunks are fetched concurrently
+        """
+        try:
+            if not locations:
+                return None
+            await asyncio.gather(*(self._resolve(location=location) for location in locations))
+            frames = await self._fetch_frames(locations=locations, time_interval=time_interval, duration=duration)
+            return pd.concat(frames, keys=range(len(frames)), names=["location", "timestamp"])
+        except LocationNotFoundError as e:
+            raise LocationNotFoundError(f"Error: {str(e)}")
+        except Exception as e:
+            raise ValueError(f"Error: {str(e)}")
+
+    @debug_log
+    async def get_weather_each(self, locations: list[Location], time_interval: str,
+                               duration: int) -> list[DataFrame | None]:
+        """
+        One frame per location, None for the ones that can not be geocoded instead of failing the whole list.
+        Equal addresses are geocoded once and locations sharing a grid cell are fetched once.
+        """
+        addresses = {}
+        for location in locations:
+            addresses.setdefault(Normalization.normalize_address(location=location), []).append(location)
+        resolved = await asyncio.gather(*(self._resolve(location=same[0]) for same in addresses.values()),
+                                        return_exceptions=True)
+        for same, error in zip(addresses.values(), resolved):
+            if isinstance(error, BaseException):
+                if not isinstance(error, LocationNotFoundError):  # anything else is a real failure
+                    raise error
+                continue
+            for location in same[1:]:
+                location.coordinates = same[0].coordinates
+
+        located = [location for location in locations if location.coordinates is not None]
+        frames = iter(await self._fetch_frames(locations=located, time_interval=time_interval, duration=duration))
+        return [next(frames) if location.coordinates is not None else None for location in locations]
+
+    @debug_log
+    def get_weather_many_sync(self, locations: list[Location], time_interval: str, duration: int) -> DataFrame | None:
+        """
+        Blocking wrapper for callers without an event loop, e.g. the Streamlit script
+        """
+        async def run():
+            async with self:
+                return await self.get_weather_many(locations=locations, time_interval=time_interval,
+                                                   duration=duration)
+
+        return asyncio.run(run())
+
+    async def _resolve(self, location: Location) -> None:
+        # Gazetteer hits are answered in memory and do not queue behind the rate limited Nominatim requests
+        coordinates = self.gazetteer.lookup(location=location) if self.gazetteer is not None else None
+        if coordinates is None:
+            async with self._geocode_semaphore:
+                coordinates = await self.geo_client.get_coordinates(location=location)
+        location.coordinates = coordinates
+        Validation.validate_location(location=location)
+
+    async def _fetch_frames(self, locations: list[Location], time_interval: str, duration: int) -> list[DataFrame]:
+        """
+        One frame per location, same caching as OpenMeteoService.get_weather_batch: cached grid cells are taken
+        from the frame cache, the others are requested once in concurrent chunks and cached
+        """
+        service = self.weather_service
+        frames = [None] * len(locations)
+        keys = []
+        missing = []
+        first = {}  # key -> first missing location with it
+        for i, location in enumerate(locations):
+            params = service._build_parameter(location=location, time_interval=time_interval, duration=duration)
+            keys.append(service.frame_cache.build_key(params=params))
+            frames[i] = service.frame_cache.get(keys[i])
+            if frames[i] is not None:
+                service._count_snapped_hit(df=frames[i], location=location)
+            elif keys[i] not in first:
+                first[keys[i]] = i
+                missing.append(i)
+
+        chunks = service._chunk_locations(locations=[locations[i] for i in missing])
+        results = await asyncio.gather(*(self._fetch_chunk(chunk=chunk, time_interval=time_interval,
+                                                           duration=duration) for chunk in chunks))
+        for i, df in zip(missing, (df for chunk_frames in results for df in chunk_frames)):
+            df.attrs["coordinates"] = _exact_coordinates(locations[i])
+            service.frame_cache.set(keys[i], df)
+            frames[i] = df.copy(deep=False)  # the cached frame itself is never handed out
+
+        for i, key in enumerate(keys):
+            if frames[i] is None:
+                frames[i] = frames[first[key]].copy(deep=False)
+                service._count_snapped_hit(df=frames[i], location=locations[i])
+        return frames
+
+    async def _fetch_chunk(self, chunk: list[Location], time_interval: str, duration: int) -> list[DataFrame]:
+        params = self.weather_service._build_batch_parameter(locations=chunk, time_interval=time_interval,
+                                                             duration=duration)
+        async with self._weather_semaphore:
+            responses = await self.weather_client.get_weather(url=open_meteo_forecast_url, params=params)
+        if len(responses) != len(chunk):
+            raise ValueError(f"Expected {len(chunk)} responses from open-meteo, got {len(responses)}")
+        return [self.weather_service._handle_response(response=response, params=params) for response in responses]
@@ -1,7 +1,11 @@
+from typing import Callable, Iterator
+
 from pandas import DataFrame
 
+import config.settings
 from domain.factory.weather_client_factory import WeatherClientFactory
 from domain.models.cache_strategy import CacheStrategy
+from domain.models.geocode_cache import GeocodeCache
 from infrastructure.api_clients.geopy_api import *
 from utils.validation import Validation
 
@@ -9,16 +13,85 @@ from utils.validation import Validation
 class WeatherFacade:
     def __init__(self, api_name):
         self.cache = CacheStrategy()
-        self.geo_client = GeoLocationClient()
+        self.geocode_cache = GeocodeCache()
+        self.geo_client = GeoLocationClient(cache=self.geocode_cache, gazetteer=Gazetteer.create())
         self.weather_client = WeatherClientFactory.create_client(api_name=api_name, cache=self.cache)
+        # Called with every successfully served request, e.g. to learn the hot locations
+        self.request_listeners: list[Callable[[Location, str, int], None]] = []
+
+    def close(self) -> None:
+        self.weather_client.close()
+        self.cache.close()
+        self.geocode_cache.close()
 
     @debug_log
     def get_weather(self, location: Location, time_interval: str, duration: int) -> DataFrame | None:
         try:
             location.coordinates = self.geo_client.get_coordinates(location=location)
             if Validation.validate_location(location=location):
-                return self.weather_client.get_weather(location=location, time_interval=time_interval,
-                                                       duration=duration)
+                df = self.weather_client.get_weather(location=location, time_interval=time_interval,
+                                                     duration=duration)
+                for listener in self.request_listeners:
+                    listener(location, time_interval, duration)
+                return df
             return None
+        except LocationNotFoundError as e:
+            raise LocationNotFoundError(f"Error: {str(e)}")
         except Exception as e:
             raise ValueError(f"Error: {str(e)}")
+
+    @debug_log
+    def refresh_weather(self, location: Location, time_interval: str, duration: int) -> DataFrame | None:
+        try:
+            location.coordinates = self.geo_client.get_coordinates(location=location)
+            if Validation.validate_location(location=location):
+                return self.weather_client.refresh(location=location, time_interval=time_interval,
+                                                   duration=duration)
+            return None
+        except LocationNotFoundError as e:
+            raise LocationNotFoundError(f"Error: {str(e)}")
+        except Exception as e:
+            raise ValueError(f"Error: {str(e)}")
+
+    @debug_log
+    def get_weather_batch(self, locations: list[Location], time_interval: str, duration: int,
+                          skip_not_found: bool = False) -> DataFrame | None:
+        """
+        skip_not_found leaves out the locations that can not be geocoded (their coordinates stay None) instead of
+        failing the whole batch, location in the index stays the position in the given list
+        """
+        try:
+            found = []
+            for i, location in enumerate(locations):
+                try:
+                    location.coordinates = self.geo_client.get_coordinates(location=location)
+                    Validation.validate_location(location=location)
+                    found.append(i)
+                except LocationNotFoundError:
+                    if not skip_not_found:
+                        raise
+                    location.coordinates = None
+            if not found:
+                return None
+            df = self.weather_client.get_weather_batch(locations=[locations[i] for i in found],
+                                                       time_interval=time_interval, duration=duration)
+            if len(found) < len(locations):
+                df.index = df.index.set_levels([found[i] for i in df.index.levels[0]], level="location")
+            return df
+        except LocationNotFoundError as e:
+            raise LocationNotFoundError(f"Error: {str(e)}")
+        except Exception as e:
+            raise ValueError(f"Error: {str(e)}")
+
+    @debug_log
+    def iter_weather_batch(self, locations: list[Location], time_interval: str, duration: int,
+                           chunk_size: int = config.settings.batch_max_locations) -> Iterator[DataFrame]:
+        """
+        Yields the batch chunk by chunk, location keeps counting over all chunks, e.g. for streamed exports
+        """
+        for start in range(0, len(locations), chunk_size):
+            df = self.get_weather_batch(locations=locations[start:start + chunk_size], time_interval=time_interval,
+                                        duration=duration)
+            if df is not None:
+                df.index = df.index.set_levels(df.index.levels[0] + start, level="location")
+                yield df
@@ -1,6 +1,7 @@
 from config.logging_config import debug_log
 from domain.interface.weather_client_interface import WeatherClientInterface
 from domain.models.cache_strategy import CacheStrategy
+from domain.services.open_meteo_archive_service import OpenMeteoArchiveService
 from domain.services.open_meteo_service import OpenMeteoService
 
 
@@ -10,6 +11,7 @@ class WeatherClientFactory:
     def create_client(api_name: str, cache: CacheStrategy) -> WeatherClientInterface:
         if api_name == "open-meteo":
             return OpenMeteoService(cache=cache)
+        elif api_name == "open-meteo-archive":
+            return OpenMeteoArchiveService(cache=cache)
         else:
-            pass
-        # TODO add other api
+            raise ValueError(f"Unknown weather api: {api_name}")
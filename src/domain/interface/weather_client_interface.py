@@ -10,6 +10,19 @@ class WeatherClientInterface(ABC):
     def get_weather(self, location: Location, time_interval: str, duration: int) -> DataFrame:
         pass
 
+    @abstractmethod
+    def get_weather_batch(self, locations: list[Location], time_interval: str, duration: int) -> DataFrame:
+        pass
+
+    def refresh(self, location: Location, time_interval: str, duration: int) -> DataFrame:
+        """
+        Fetches the forecast bypassing every cache, clients without caches simply fetch it
+        """
+        return self.get_weather(location=location, time_interval=time_interval, duration=duration)
+
+    def close(self) -> None:
+        pass
+
     @abstractmethod
     def _build_parameter(self, location: Location, time_interval: str, duration: int) -> dict:
         pass
@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from requests_cache import BaseCache, FileCache, SQLiteCache
+
+from config.settings import cache_backend, cache_max_entries, cache_purge_interval, cache_redis_url
+
+
+class CacheBackends:
+    @staticmethod
+    def create(name_cache: str, backend: str = cache_backend) -> BaseCache:
+        if backend == "memory":
+            return BaseCache()
+        if backend == "filesystem":
+            return FileCache(cache_name=name_cache)
+        if backend == "sqlite":
+            # One shared connection for every thread, WAL lets readers continue while a worker writes
+            return SQLiteCache(db_path=name_cache, wal=True, busy_timeout=5000)
+        if backend == "redis":
+            try:
+                # noinspection PyUnresolvedReferences
+                from redis import Redis
+                from requests_cache import RedisCache
+            except ImportError:
+                raise ValueError("The redis cache backend needs the redis package: pip install redis")
+            return RedisCache(namespace=name_cache, connection=Redis.from_url(cache_redis_url))
+        raise ValueError(f"Unknown cache backend: {backend}")
+
+
+class CachePurger:
+    """
+    Background job removing expired responses and evicting the oldest ones above max_entries.
+    Responses are kept stale_period seconds past their expiry for stale-while-revalidate.
+    """
+
+    def __init__(self, backend: BaseCache, max_entries: int = cache_max_entries,
+                 interval: float = cache_purge_interval, stale_period: int = 0):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.interval = interval
+        self.stale_period = stale_period
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cache-purger", daemon=True)
+
+    def start(self) -> None:
+        if self.interval > 0:
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=5)
+
+    def purge(self) -> None:
+        if isinstance(self.backend, SQLiteCache):
+            responses = self.backend.responses
+            with responses.connection(commit=True) as connection:
+                connection.execute(f"DELETE FROM {responses.table_name} WHERE expires <= ?",
+                                   (round(time.time() - self.stale_period),))
+        elif self.stale_period:
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.stale_period)
+            self.backend.delete(*[response.cache_key for response in self.backend.filter(valid=True, expired=True)
+                                  if response.expires is not None and response.expires <= cutoff])
+        else:
+            self.backend.delete(expired=True)
+        excess = len(self.backend.responses) - self.max_entries
+        if excess > 0:
+            self._evict(excess=excess)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.purge()
+            except Exception as e:  # the purger must survive a locked or unreachable cache
+                logging.getLogger(__name__).warning(f"Cache purge failed: {e}")
+
+    def _evict(self, excess: int) -> None:
+        if isinstance(self.backend, SQLiteCache):
+            responses = self.backend.responses
+            with responses.connection(commit=True) as connection:
+                connection.execute(
+                    f"DELETE FROM {responses.table_name} WHERE key IN "
+                    f"(SELECT key FROM {responses.table_name} ORDER BY expires LIMIT ?)", (excess,)
+                )
+            return
+        oldest = sorted(self.backend.filter(valid=True, expired=True), key=lambda response: response.created_at)
+        self.backend.delete(*[response.cache_key for response in oldest[:excess]])
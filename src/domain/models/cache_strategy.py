@@ -1,11 +1,60 @@
+from datetime import timedelta
+
 import requests_cache
+from requests.adapters import HTTPAdapter
 from retry_requests import retry
+from urllib3.util.retry import Retry
+
+from config.metrics import Metrics
+from config.settings import expiration_cache, backoff_factor_cache, retries_cache, cache_name, \
+    http_pool_connections, http_pool_maxsize, cache_backend, stale_while_revalidate
+from domain.models.cache_backends import CacheBackends, CachePurger
+from domain.models.frame_cache import FrameCache
+
 
-from config.settings import expiration_cache, backoff_factor_cache, retries_cache, cache_name
+class MeteredRetry(Retry):
+    """
+    Retry policy of retry_requests that counts every retried upstream request
+    """
+
+    def increment(self, *args, **kwargs):
+        Metrics.count("http_retries")
+        return super().increment(*args, **kwargs)
 
 
 class CacheStrategy:
     def __init__(self, name_cache: str = cache_name, expire_after: int = expiration_cache, retries: int = retries_cache,
-                 backoff_factor: float = backoff_factor_cache):
-        cache_session = requests_cache.CachedSession(cache_name=name_cache, expire_after=expire_after)
-        self.retry_session = retry(session=cache_session, retries=retries, backoff_factor=backoff_factor)
+                 backoff_factor: float = backoff_factor_cache, pool_connections: int = http_pool_connections,
+                 pool_maxsize: int = http_pool_maxsize, backend: str = cache_backend,
+                 stale_period: int = stale_while_revalidate):
+        self.frame_cache = FrameCache(expire_after=expire_after, stale_period=stale_period)
+        self.backend = CacheBackends.create(name_cache=name_cache, backend=backend)
+        # The http cache serves stale responses as well, e.g. after a restart when the frame cache is empty
+        self.cache_session = requests_cache.CachedSession(
+            backend=self.backend, expire_after=expire_after,
+            stale_while_revalidate=timedelta(seconds=stale_period) if stale_period else False
+        )
+        self.purger = CachePurger(backend=self.backend, stale_period=stale_period)
+        self.purger.start()
+        self.retry_session = retry(session=self.cache_session, retries=retries, backoff_factor=backoff_factor)
+        # retry() mounts its own adapters, they get replaced by pooled ones with the same retry policy
+        for prefix, adapter in list(self.retry_session.adapters.items()):
+            policy = adapter.max_retries
+            max_retries = MeteredRetry(total=policy.total, connect=policy.connect, read=policy.read,
+                                       backoff_factor=policy.backoff_factor, status_forcelist=policy.status_forcelist,
+                                       allowed_methods=policy.allowed_methods)
+            self.retry_session.mount(prefix, HTTPAdapter(max_retries=max_retries, pool_connections=pool_connections,
+                                                         pool_maxsize=pool_maxsize))
+        self.cache_session.hooks["response"].append(self._count_cache_hit)
+
+    @staticmethod
+    def _count_cache_hit(response, *args, **kwargs):
+        # requests_cache dispatches the hook a second time for responses it just stored
+        if not getattr(response, "_cache_counted", False):
+            response._cache_counted = True
+            Metrics.count("http_cache_hits" if getattr(response, "from_cache", False) else "http_cache_misses")
+        return response
+
+    def close(self) -> None:
+        self.purger.stop()
+        self.retry_session.close()
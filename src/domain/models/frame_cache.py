@@ -0,0 +1,152 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from pandas import DataFrame
+
+from config.settings import expiration_cache, frame_cache_max_bytes, frame_cache_spill_dir, stale_while_revalidate
+
+
+class FrameCache:
+    """
+    LRU cache of decoded DataFrames, bounded by their memory usage and expiring together with the http cache.
+    Expired frames are kept for another stale_period seconds, lookup() still returns them marked as stale.
+    With a spill directory every frame is also written as Parquet, so a restarted process starts warm.
+    Every stored frame gets its fetch time (epoch seconds) in df.attrs["fetched_at"].
+    """
+
+    def __init__(self, expire_after: int = expiration_cache, max_bytes: int = frame_cache_max_bytes,
+                 spill_dir: str | None = frame_cache_spill_dir, stale_period: int = stale_while_revalidate):
+        self.expire_after = expire_after
+        self.stale_period = stale_period
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+
+        self.hits = 0
+        self.spill_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+        self._frames = OrderedDict()  # key -> (expires_at, size, DataFrame)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def build_key(params: dict) -> tuple:
+        """
+        Builds a hashable key from request parameters, coordinates are rounded to ~11 m
+        """
+        key = []
+        for name, value in sorted(params.items()):
+            if name in ("latitude", "longitude") and isinstance(value, float):
+                value = round(value, 4)
+            elif isinstance(value, list):
+                value = tuple(value)
+            key.append((name, value))
+        return tuple(key)
+
+    def get(self, key: tuple) -> DataFrame | None:
+        """
+        Returns the frame only while it is fresh
+        """
+        df, stale = self.lookup(key)
+        return None if stale else df
+
+    def lookup(self, key: tuple) -> tuple[DataFrame | None, bool]:
+        """
+        Returns (frame, stale), stale frames are past expire_after but within the stale period
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._frames.get(key)
+            if entry is not None:
+                expires_at, _, df = entry
+                if expires_at + self.stale_period > now:
+                    self._frames.move_to_end(key)
+                    stale = expires_at <= now
+                    self.hits += not stale
+                    self.stale_hits += stale
+                    return df.copy(deep=False), stale  # callers may add columns or reset the index
+                self._evict(key)
+
+        df, expires_at = self._read_spill(key=key, now=now)
+        with self._lock:
+            if df is None:
+                self.misses += 1
+                return None, False
+            stale = expires_at <= now
+            self.hits += not stale
+            self.stale_hits += stale
+            self.spill_hits += 1
+        return df.copy(deep=False), stale
+
+    def set(self, key: tuple, df: DataFrame, fetched_at: float | None = None) -> None:
+        """
+        fetched_at is when the data left upstream, e.g. the creation time of a stale http cache entry, the frame
+        expires expire_after seconds after it and not after the decode. Defaults to now.
+        """
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        df.attrs["fetched_at"] = fetched_at
+        self._store(key=key, df=df, expires_at=fetched_at + self.expire_after)
+        if self.spill_dir is not None:
+            path = self._spill_path(key=key)
+            df.to_parquet(f"{path}.tmp")
+            os.utime(f"{path}.tmp", (fetched_at, fetched_at))  # _read_spill takes the fetch time from the mtime
+            os.replace(f"{path}.tmp", path)  # readers never see a half written file
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "spill_hits": self.spill_hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "entries": len(self._frames),
+                "bytes": self._size,
+            }
+
+    def _store(self, key: tuple, df: DataFrame, expires_at: float) -> None:
+        size = int(df.memory_usage(index=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._frames:
+                self._evict(key)
+            self._frames[key] = (expires_at, size, df)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._evict(next(iter(self._frames)))
+
+    def _evict(self, key: tuple) -> None:
+        _, size, _ = self._frames.pop(key)
+        self._size -= size
+
+    def _spill_path(self, key: tuple) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_dir, f"{digest}.parquet")
+
+    def _read_spill(self, key: tuple, now: float) -> tuple[DataFrame | None, float]:
+        if self.spill_dir is None:
+            return None, 0.0
+        path = self._spill_path(key=key)
+        try:
+            fetched_at = os.path.getmtime(path)
+            expires_at = fetched_at + self.expire_after
+            if expires_at + self.stale_period <= now:
+                return None, 0.0
+            df = pd.read_parquet(path)
+        except (OSError, ValueError):
+            return None, 0.0
+        df.attrs["fetched_at"] = fetched_at
+        self._store(key=key, df=df, expires_at=expires_at)
+        return df, expires_at
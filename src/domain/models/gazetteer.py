@@ -0,0 +1,175 @@
+import os
+import pickle
+import threading
+from bisect import bisect_left
+
+import numpy as np
+from pandas import DataFrame
+
+from config.metrics import Metrics
+from config.settings import (gazetteer_index_path, gazetteer_min_prefix, gazetteer_prefix_candidates,
+                             gazetteer_reverse_max_distance, geocoder)
+from domain.models.location import Coordinates, Location
+from utils.kd_tree import KdTree
+from utils.normalization import Normalization
+
+_earth_radius = 6371.0  # km
+
+
+class Gazetteer:
+    """
+    Offline geocoding from a local gazetteer, e.g. a GeoNames postal code dump, prebuilt into a binary index
+    (application/cli/build_gazetteer.py) and loaded once per process. (country, postal code) and (country, place)
+    are dict lookups, unknown place names are completed by prefix on the sorted names and reverse lookups use a
+    KD-tree over all places. The index is a pickle, only load files you have built yourself.
+    """
+
+    version = 1
+    _loaded: dict[str, "Gazetteer"] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, countries: dict[str, str], postal_codes: dict[tuple[str, str], int],
+                 places: dict[tuple[str, str], int], names: list[str], coordinates: np.ndarray, tree: KdTree,
+                 record_countries: list[str], record_postal_codes: list[str], record_names: list[str]):
+        self.countries = countries  # normalized country name, ISO2 or ISO3 code -> ISO2 code
+        self.postal_codes = postal_codes  # (ISO2, normalized postal code) -> row of coordinates
+        self.places = places  # (ISO2, normalized place name) -> row of coordinates
+        self.names = names  # sorted "<ISO2>|<normalized place name>" for the prefix search
+        self.coordinates = coordinates  # (rows, 2) mean latitude and longitude of each key
+        self.tree = tree  # unit vectors of every record, the record lists below are in the same order
+        self.record_countries = record_countries
+        self.record_postal_codes = record_postal_codes
+        self.record_names = record_names
+
+    @staticmethod
+    def create(name: str = geocoder, path: str = gazetteer_index_path) -> "Gazetteer | None":
+        """
+        The gazetteer of the configured geocoder, None when only Nominatim is used
+        """
+        if name == "nominatim":
+            return None
+        if name == "gazetteer":
+            return Gazetteer.load(path=path)
+        raise ValueError(f"Unknown geocoder: {name}")
+
+    @classmethod
+    def load(cls, path: str = gazetteer_index_path) -> "Gazetteer":
+        with cls._lock:
+            gazetteer = cls._loaded.get(path)
+            if gazetteer is None:
+                if not os.path.exists(path):
+                    raise ValueError(f"Gazetteer index {path} not found, build it with "
+                                     f"python -m application.cli.build_gazetteer")
+                with open(path, "rb") as file, Metrics.measure("gazetteer_load"):
+                    index = pickle.load(file)
+                if index.pop("version", None) != cls.version:
+                    raise ValueError(f"Gazetteer index {path} was built by another version, build it again")
+                gazetteer = cls._loaded[path] = Gazetteer(**index)
+        return gazetteer
+
+    def save(self, path: str) -> None:
+        index = {"version": self.version, **vars(self)}
+        # Written next to the final name and moved, a running process never loads half an index
+        with open(f"{path}.tmp", "wb") as file:
+            pickle.dump(index, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+
+    @staticmethod
+    def build(df: DataFrame, country_names: dict[str, str] | None = None) -> "Gazetteer":
+        """
+        Index of the records in df (country_code, postal_code, place_name, latitude, longitude). country_names maps
+        country names and ISO3 codes to the ISO2 codes of the records, the codes themselves are always known.
+        """
+        df = df.dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
+        codes = df["country_code"].str.upper()
+        latitudes = df["latitude"].to_numpy(dtype=np.float64)
+        longitudes = df["longitude"].to_numpy(dtype=np.float64)
+        keys = DataFrame({"country": codes, "postal_code": df["postal_code"].map(Normalization.normalize_text),
+                          "place": df["place_name"].map(Normalization.normalize_text),
+                          "latitude": latitudes, "longitude": longitudes})
+
+        # A postal code or place name shared by several records is geocoded to their centre
+        postal_groups = keys[keys["postal_code"] != ""].groupby(["country", "postal_code"], sort=False)
+        postal_groups = postal_groups[["latitude", "longitude"]].mean()
+        place_groups = keys[keys["place"] != ""].groupby(["country", "place"], sort=False)
+        place_groups = place_groups[["latitude", "longitude"]].mean()
+        coordinates = np.concatenate([postal_groups.to_numpy(), place_groups.to_numpy()])
+        postal_codes = dict(zip(postal_groups.index, range(len(postal_groups))))
+        places = dict(zip(place_groups.index, range(len(postal_groups), len(coordinates))))
+
+        known = set(codes)
+        countries = {Normalization.normalize_text(code): code for code in known}
+        for name, code in (country_names or {}).items():
+            if code in known:
+                countries[Normalization.normalize_text(name)] = code
+
+        points = Gazetteer._unit_vectors(latitudes=latitudes, longitudes=longitudes)
+        order = KdTree.build(points=points)
+        return Gazetteer(countries=countries, postal_codes=postal_codes, places=places,
+                         names=sorted(f"{country}|{place}" for country, place in place_groups.index),
+                         coordinates=coordinates, tree=KdTree(points=points[order]),
+                         record_countries=codes.to_numpy()[order].tolist(),
+                         record_postal_codes=df["postal_code"].to_numpy()[order].tolist(),
+                         record_names=df["place_name"].to_numpy()[order].tolist())
+
+    def lookup(self, location: Location) -> Coordinates | None:
+        """
+        Postal code first, then the exact place name, then the shortest place name starting with the given one
+        """
+        country = self.countries.get(Normalization.normalize_text(location.country))
+        row = None
+        if country is not None:
+            postal_code = Normalization.normalize_text(location.postal_code)
+            city = Normalization.normalize_text(location.city)
+            if postal_code:
+                row = self.postal_codes.get((country, postal_code))
+            if row is None and city:
+                row = self.places.get((country, city))
+                if row is None and len(city) >= gazetteer_min_prefix:
+                    row = self._complete(country=country, prefix=city)
+
+        if row is None:
+            Metrics.count("gazetteer_misses")
+            return None
+        Metrics.count("gazetteer_hits")
+        latitude, longitude = self.coordinates[row]
+        return Coordinates(latitude=float(latitude), longitude=float(longitude))
+
+    def reverse(self, coordinates: Coordinates) -> Location | None:
+        """
+        The nearest place, None if it is farther than gazetteer_reverse_max_distance km
+        """
+        point = self._unit_vectors(latitudes=np.array([coordinates.latitude]),
+                                   longitudes=np.array([coordinates.longitude]))[0]
+        i, squared = self.tree.nearest(point=point)
+        # Chord length of the unit sphere to the great circle distance
+        if i < 0 or 2 * _earth_radius * np.arcsin(min(np.sqrt(squared) / 2, 1.0)) > gazetteer_reverse_max_distance:
+            return None
+        x, y, z = self.tree.points[i].astype(np.float64)
+        return Location(country=self.record_countries[i], city=self.record_names[i],
+                        postal_code=self.record_postal_codes[i],
+                        coordinates=Coordinates(latitude=float(np.degrees(np.arcsin(np.clip(z, -1, 1)))),
+                                                longitude=float(np.degrees(np.arctan2(y, x)))))
+
+    def _complete(self, country: str, prefix: str) -> int | None:
+        prefix = f"{country}|{prefix}"
+        start = bisect_left(self.names, prefix)
+        best = None
+        for name in self.names[start:start + gazetteer_prefix_candidates]:
+            if not name.startswith(prefix):
+                break
+            if best is None or len(name) < len(best):
+                best = name
+        if best is None:
+            return None
+        return self.places[(country, best.split("|", 1)[1])]
+
+    @staticmethod
+    def _unit_vectors(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        """
+        Points on the unit sphere, euclidean distance grows with the great circle distance and there is no
+        seam at the antimeridian
+        """
+        latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+        return np.column_stack([np.cos(latitudes) * np.cos(longitudes), np.cos(latitudes) * np.sin(longitudes),
+                                np.sin(latitudes)]).astype(np.float32)
@@ -0,0 +1,90 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config.settings import geocode_cache_name, geocode_expiration, geocode_negative_expiration, geocode_memory_size
+from domain.models.location import Coordinates
+
+
+class GeocodeCache:
+    """
+    Two tier cache for geocoding results: an in-memory LRU in front of a SQLite file.
+    A stored None means the address is known to not exist (negative caching).
+    """
+
+    def __init__(self, name_cache: str = geocode_cache_name, expire_after: int = geocode_expiration,
+                 negative_expire_after: int = geocode_negative_expiration, memory_size: int = geocode_memory_size):
+        self.expire_after = expire_after
+        self.negative_expire_after = negative_expire_after
+        self.memory_size = memory_size
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._memory = OrderedDict()  # key -> (expires_at, Coordinates | None)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(name_cache, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            "address TEXT PRIMARY KEY, latitude REAL, longitude REAL, expires_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def get(self, key: str) -> tuple[bool, Coordinates | None]:
+        """
+        Returns (found, coordinates), coordinates is None for a cached "Location not found"
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+
+            row = self._connection.execute(
+                "SELECT latitude, longitude, expires_at FROM geocode WHERE address = ?", (key,)
+            ).fetchone()
+            if row is not None and row[2] > now:
+                coordinates = None if row[0] is None else Coordinates(latitude=row[0], longitude=row[1])
+                self._remember(key=key, expires_at=row[2], coordinates=coordinates)
+                self.hits += 1
+                self.disk_hits += 1
+                return True, coordinates
+
+            self.misses += 1
+            return False, None
+
+    def set(self, key: str, coordinates: Coordinates | None) -> None:
+        expire_after = self.expire_after if coordinates is not None else self.negative_expire_after
+        expires_at = time.time() + expire_after
+        latitude = coordinates.latitude if coordinates is not None else None
+        longitude = coordinates.longitude if coordinates is not None else None
+        with self._lock:
+            self._remember(key=key, expires_at=expires_at, coordinates=coordinates)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO geocode (address, latitude, longitude, expires_at) VALUES (?, ?, ?, ?)",
+                (key, latitude, longitude, expires_at)
+            )
+            self._connection.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _remember(self, key: str, expires_at: float, coordinates: Coordinates | None) -> None:
+        self._memory[key] = (expires_at, coordinates)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
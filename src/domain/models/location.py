@@ -1,6 +1,12 @@
 from dataclasses import dataclass
 
 
+class LocationNotFoundError(ValueError):
+    """
+    The address could not be geocoded, a ValueError like every other error the facades report
+    """
+
+
 @dataclass
 class Coordinates:
     latitude: float
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable
+
+from config.metrics import Metrics
+from config.settings import single_flight, single_flight_lock_dir, single_flight_lock_stripes, single_flight_timeout
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the function, the others wait for it
+    and share its result or exception. Nothing is kept once the call has finished, caching is left to the caches.
+    """
+
+    def __init__(self, timeout: float = single_flight_timeout):
+        self.timeout = timeout
+        self._calls: dict[Any, _Call] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def create(mode: str = single_flight) -> "SingleFlight":
+        if mode == "memory":
+            return SingleFlight()
+        if mode == "file":
+            return FileLockSingleFlight()
+        raise ValueError(f"Unknown single flight mode: {mode}")
+
+    def do(self, key, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.done.wait(timeout=self.timeout):
+                Metrics.count("single_flight_shared")
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            # The leader hangs, this caller does not wait any longer than without coalescing
+            Metrics.count("single_flight_timeouts")
+            return fn()
+
+        try:
+            with self._exclusive(key):
+                call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    @contextmanager
+    def _exclusive(self, key):
+        yield
+
+
+class FileLockSingleFlight(SingleFlight):
+    """
+    Extends the coalescing to every process sharing lock_dir, e.g. several Streamlit servers behind a proxy.
+    Only the leader of each process takes the file lock, the function has to look into the shared cache first,
+    so that the processes that got the lock later find the result of the first one there.
+    Keys are spread over a fixed number of lock files, unrelated keys rarely share one.
+    """
+
+    def __init__(self, timeout: float = single_flight_timeout, lock_dir: str = single_flight_lock_dir,
+                 stripes: int = single_flight_lock_stripes):
+        try:
+            import fcntl
+        except ImportError:
+            raise ValueError("The file single flight mode needs fcntl, it is not available on this platform")
+        super().__init__(timeout=timeout)
+        self._fcntl = fcntl
+        self.lock_dir = lock_dir
+        self.stripes = stripes
+        os.makedirs(lock_dir, exist_ok=True)
+
+    @contextmanager
+    def _exclusive(self, key):
+        stripe = int.from_bytes(hashlib.sha1(repr(key).encode()).digest()[:4], "big") % self.stripes
+        with open(os.path.join(self.lock_dir, f"{stripe}.lock"), "a") as file:
+            locked = self._acquire(file=file)
+            try:
+                yield
+            finally:
+                if locked:
+                    self._fcntl.flock(file, self._fcntl.LOCK_UN)
+
+    def _acquire(self, file) -> bool:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self._fcntl.flock(file, self._fcntl.LOCK_EX | self._fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    Metrics.count("single_flight_timeouts")
+                    return False
+                time.sleep(0.05)
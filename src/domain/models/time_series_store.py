@@ -0,0 +1,86 @@
+import hashlib
+import os
+import threading
+from datetime import date, timedelta
+
+import pandas as pd
+import pyarrow as pa
+from pandas import DataFrame
+
+from config.metrics import Metrics
+from config.settings import time_series_final_delay, time_series_store_dir
+from domain.models.frame_cache import FrameCache
+
+
+class TimeSeriesStore:
+    """
+    Append-only store of past days, which do not change once they are final. One Arrow IPC file per location
+    cell (coordinates, timezone and variables) and local date: <root>/<cell>/<YYYY-MM-DD>.arrow.
+    A day is final time_series_final_delay seconds after its local midnight ended, files are never rewritten
+    and are read memory-mapped, only the requested days are touched.
+    """
+
+    def __init__(self, root_dir: str = time_series_store_dir, final_delay: int = time_series_final_delay):
+        self.root_dir = root_dir
+        self.final_delay = final_delay
+        os.makedirs(root_dir, exist_ok=True)
+
+    def final_dates(self, params: dict) -> list[date]:
+        """
+        The requested past days that are final already, oldest first
+        """
+        now = pd.Timestamp.now(tz=params["timezone"])
+        today = now.normalize()
+        last = today - pd.Timedelta(days=1)
+        if now - today < pd.Timedelta(seconds=self.final_delay):
+            last -= pd.Timedelta(days=1)  # yesterday's last hours are still being corrected
+        first = today - pd.Timedelta(days=params["past_days"])
+        return [day.date() for day in pd.date_range(first.tz_localize(None), last.tz_localize(None), freq="D")]
+
+    def read(self, params: dict, dates: list[date]) -> DataFrame | None:
+        """
+        The stored days as one frame, None if any of them is missing
+        """
+        if not self.contains(params=params, dates=dates):
+            return None
+
+        # The mapped files back the tables, nothing is read before pandas copies the columns it needs
+        tables = [pa.ipc.open_file(pa.memory_map(self._path(params=params, day=day))).read_all() for day in dates]
+        df = pa.concat_tables(tables).to_pandas().set_index("timestamp")
+        Metrics.count("store_days_read", len(dates))
+        return df
+
+    def contains(self, params: dict, dates: list[date]) -> bool:
+        return bool(dates) and all(os.path.exists(self._path(params=params, day=day)) for day in dates)
+
+    def append(self, params: dict, df: DataFrame) -> None:
+        """
+        Writes the final days of a fetched frame that are not stored yet
+        """
+        index = df.index.asi8
+        written = 0
+        for day in self.final_dates(params=params):
+            path = self._path(params=params, day=day)
+            if os.path.exists(path):
+                continue
+            start = pd.Timestamp(day).tz_localize(params["timezone"])
+            end = pd.Timestamp(day + timedelta(days=1)).tz_localize(params["timezone"])
+            lower, upper = index.searchsorted([start.value, end.value])
+            if lower == upper:
+                continue
+            table = pa.Table.from_pandas(df.iloc[lower:upper].reset_index(), preserve_index=False)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp, path)  # readers never see a half written day
+            written += 1
+        if written:
+            Metrics.count("store_days_written", written)
+
+    def _path(self, params: dict, day: date) -> str:
+        cell = FrameCache.build_key({name: value for name, value in params.items()
+                                     if name not in ("past_days", "forecast_days")})
+        digest = hashlib.sha1(repr(cell).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.root_dir, digest, f"{day.isoformat()}.arrow")
@@ -0,0 +1,55 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+
+@dataclass(slots=True)
+class WeatherFrame:
+    """
+    A fetched frame with what the summary pages read on every rerun: the sorted timestamps as int64 for as-of
+    lookups and min/max/mean of every variable. Built once per fetch, the frame is not copied.
+    """
+    df: DataFrame
+    timestamps: np.ndarray  # epoch nanoseconds, ascending
+    daily: bool
+    stats: dict[str, dict[str, float]] = field(default_factory=dict)
+
+    @staticmethod
+    def from_dataframe(df: DataFrame) -> "WeatherFrame":
+        timestamps = df["timestamp"] if "timestamp" in df.columns else df.index
+        timestamps = pd.DatetimeIndex(timestamps).as_unit("ns")
+        order = timestamps.argsort()
+        if (np.diff(order) < 0).any():  # open-meteo answers sorted, anything else is sorted here once
+            df = df.iloc[order]
+            timestamps = timestamps[order]
+        values = timestamps.asi8
+
+        # Daily rows are a local midnight apart, 23 or 25 hours on the days the clock changes
+        daily = len(values) > 1 and values[1] - values[0] >= pd.Timedelta(hours=23).value
+        numeric = df.select_dtypes(include="number")
+        stats = {name: {"min": float(column.min()), "max": float(column.max()), "mean": float(column.mean())}
+                 for name, column in numeric.items()}
+        return WeatherFrame(df=df, timestamps=values, daily=daily, stats=stats)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def current(self, now: pd.Timestamp | None = None) -> pd.Series:
+        """
+        Daily: the day containing now (the last row starting before it). Hourly: the row closest to now.
+        Falls back to the first or last row when now is outside the frame.
+        """
+        now = (pd.Timestamp.now(tz="UTC") if now is None else now).value
+        # Binary search instead of comparing every timestamp with now
+        i = int(np.searchsorted(self.timestamps, now, side="right")) - 1
+        if i < 0:
+            return self.df.iloc[0]
+        if not self.daily and i + 1 < len(self.timestamps) and \
+                self.timestamps[i + 1] - now < now - self.timestamps[i]:
+            i += 1
+        return self.df.iloc[i]
+
+    def stat(self, name: str, how: str) -> float:
+        return self.stats[name][how]
@@ -0,0 +1,45 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from domain.models.weather_data import WeatherData
+
+
+@dataclass(slots=True)
+class WeatherSeries:
+    """
+    Struct of arrays for one location: a shared timestamp index and one typed numpy array per variable.
+    Column names are the WeatherData field names.
+    """
+    timestamps: pd.DatetimeIndex
+    columns: dict[str, np.ndarray] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def add(self, name: str, values: np.ndarray) -> None:
+        if len(values) != len(self.timestamps):
+            raise ValueError(f"Column {name} has {len(values)} values for {len(self.timestamps)} timestamps")
+        self.columns[name] = values
+
+    def drop_empty(self) -> None:
+        """
+        Removes variables without a single value, done on the arrays because dropna() on the frame copies
+        """
+        for name in [name for name, values in self.columns.items()
+                     if values.dtype.kind == "f" and np.isnan(values).all()]:
+            del self.columns[name]
+
+    def to_dataframe(self) -> DataFrame:
+        # Every array becomes its own block, pandas does not copy or consolidate them
+        return pd.DataFrame(self.columns, index=self.timestamps, copy=False)
+
+    def row(self, i: int) -> WeatherData:
+        return WeatherData(timestamp=self.timestamps[i].to_pydatetime(),
+                           **{name: values[i].item() for name, values in self.columns.items()})
+
+    def rows(self):
+        for i in range(len(self)):
+            yield self.row(i)
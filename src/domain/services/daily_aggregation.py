@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+# Daily column -> (hourly column, aggregation), in the order of config.settings.daily_params
+daily_aggregations = {
+    "temperature_2m_max": ("temperature_2m", "max"),
+    "temperature_2m_min": ("temperature_2m", "min"),
+    "weather_code": ("weather_code", "max"),  # open-meteo reports the most severe code of the day
+    "apparent_temperature_max": ("apparent_temperature_2m", "max"),
+    "apparent_temperature_min": ("apparent_temperature_2m", "min"),
+    "apparent_temperature_mean": ("apparent_temperature_2m", "mean"),
+    "temperature_2m_mean": ("temperature_2m", "mean"),
+    "rain_sum": ("rain", "sum"),
+    "showers_sum": ("shower", "sum"),
+    "snowfall_sum": ("snowfall", "sum"),
+    "wind_speed_10m_max": ("wind_speed_10m", "max"),
+    "wind_direction_10m_dominant": ("wind_direction_10m_dominant", "dominant"),
+    "visibility_max": ("visibility", "max"),
+    "visibility_min": ("visibility", "min"),
+    "visibility_mean": ("visibility", "mean"),
+    "wind_speed_10m_mean": ("wind_speed_10m", "mean"),
+    "wind_speed_10m_min": ("wind_speed_10m", "min"),
+    "wind_gust_10m_min": ("wind_gust_10m", "min"),
+    "wind_gust_10m_max": ("wind_gust_10m", "max"),
+    "wind_gust_10m_mean": ("wind_gust_10m", "mean"),
+    "relative_humidity_min": ("relative_humidity_2m", "min"),
+    "relative_humidity_max": ("relative_humidity_2m", "max"),
+    "relative_humidity_mean": ("relative_humidity_2m", "mean"),
+    "cloud_cover_mean": ("cloud_cover", "mean"),
+    "cloud_cover_max": ("cloud_cover", "max"),
+    "cloud_cover_min": ("cloud_cover", "min"),
+}
+
+
+class DailyAggregation:
+    @staticmethod
+    def aggregate(df: DataFrame, timezone: str) -> DataFrame:
+        """
+        Derives the daily columns from an hourly frame. Days are cut at midnight of the given timezone and the
+        index is returned in UTC like the daily response of open-meteo (local midnight as UTC timestamp).
+        """
+        local = df.set_axis(df.index.tz_convert(timezone))
+
+        sources = sorted({source for source, how in daily_aggregations.values()
+                          if how != "dominant" and source in local.columns})
+        stats = local[sources].resample("D").agg(["min", "max", "mean", "sum"])
+
+        columns = {}
+        for column, (source, how) in daily_aggregations.items():
+            if how == "dominant":
+                if source in local.columns and "wind_speed_10m" in local.columns:
+                    columns[column] = DailyAggregation._dominant_direction(local=local, direction=source)
+            elif source in local.columns:
+                columns[column] = stats[(source, how)]
+
+        daily = pd.DataFrame(columns)
+        # resample() sums empty days to 0, the hourly data of those days was missing entirely
+        daily = daily[local.resample("D").size() > 0]
+        daily.index = daily.index.tz_convert("UTC").rename("timestamp")
+        return daily.astype(np.float32)
+
+    @staticmethod
+    def _dominant_direction(local: DataFrame, direction: str) -> pd.Series:
+        # Direction of the speed weighted mean wind vector, averaging degrees would turn 350° and 10° into 180°
+        radians = np.deg2rad(local[direction].astype(np.float64))
+        speed = local["wind_speed_10m"].astype(np.float64)
+        components = pd.DataFrame({"u": speed * np.sin(radians), "v": speed * np.cos(radians)},
+                                  index=local.index).resample("D").sum()
+        return np.rad2deg(np.arctan2(components["u"], components["v"])) % 360
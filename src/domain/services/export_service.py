@@ -0,0 +1,74 @@
+import io
+from typing import BinaryIO, Iterable
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas import DataFrame, RangeIndex
+
+from config.logging_config import debug_log
+from config.metrics import Metrics
+
+# Format -> (mime type, file extension)
+export_formats = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+}
+
+
+class ExportService:
+    @staticmethod
+    @debug_log
+    def to_bytes(df: DataFrame, export_format: str) -> bytes:
+        sink = io.BytesIO()
+        ExportService.write(frames=[df], export_format=export_format, sink=sink)
+        return sink.getvalue()
+
+    @staticmethod
+    @debug_log
+    def write(frames: Iterable[DataFrame], export_format: str, sink: BinaryIO, columns: list[str] | None = None) -> int:
+        """
+        Writes the frames one after another into one file and returns the number of rows. The index (timestamp,
+        location) becomes regular columns followed by columns, which fix the schema, e.g.
+        OpenMeteoService.columns(time_interval). A frame lacking one of them gets it empty. Only one frame is held
+        at a time then, so a generator of location chunks can be exported without building the whole payload.
+        Without columns the union of the columns of all frames is used, which needs all of them up front.
+        """
+        if export_format not in export_formats:
+            raise ValueError(f"Unknown export format: {export_format}")
+        if columns is None:
+            frames = list(frames)
+            columns = list(dict.fromkeys(name for df in frames for name in df.columns))
+
+        writer = None
+        schema = None
+        rows = 0
+        with Metrics.measure("export"):
+            for df in frames:
+                # A location whose model lacks a variable has no column for it, the file keeps one schema
+                keys = [] if isinstance(df.index, RangeIndex) else list(df.index.names)
+                df = df.reset_index() if keys else df
+                df = df.reindex(columns=[*keys, *(name for name in columns if name not in keys)])
+
+                if export_format == "csv":
+                    sink.write(df.to_csv(index=False, header=writer is None).encode("utf-8"))
+                    writer = True
+                elif export_format == "jsonl":
+                    sink.write(df.to_json(orient="records", lines=True, date_format="iso").encode("utf-8"))
+                    writer = True
+                else:
+                    table = pa.Table.from_pandas(df, preserve_index=False)
+                    if writer is None:
+                        schema = table.schema
+                        writer = (pq.ParquetWriter(sink, schema) if export_format == "parquet"
+                                  else pa.ipc.new_stream(sink, schema))
+                    writer.write_table(table.cast(schema))
+                rows += len(df)
+
+            if export_format in ("parquet", "arrow"):
+                if writer is None:  # nothing to export, an empty file is still a valid one
+                    writer = (pq.ParquetWriter(sink, pa.schema([])) if export_format == "parquet"
+                              else pa.ipc.new_stream(sink, pa.schema([])))
+                writer.close()
+        return rows
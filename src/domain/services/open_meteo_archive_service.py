@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+import config.settings
+from config.logging_config import debug_log
+from config.metrics import Metrics
+from domain.interface.weather_client_interface import WeatherClientInterface
+from domain.models.cache_strategy import CacheStrategy
+from domain.models.location import Location
+from domain.models.weather_series import WeatherSeries
+from domain.services.open_meteo_service import OpenMeteoService, daily_columns, hourly_columns, _snap_coordinate
+from infrastructure.api_clients.open_meteo_api import OpenMeteoClient
+
+
+class OpenMeteoArchiveService(WeatherClientInterface):
+    """
+    Historical weather from the open-meteo archive (reanalysis, years back). duration is either a
+    (start, end) pair of dates or ISO strings, or (past_days, _) counted back from the newest archived day.
+    Long ranges are split into chunk_days requests fetched in parallel, every chunk is decoded into numpy
+    columns and copied once into the preallocated columns of the result.
+    """
+
+    def __init__(self, cache: CacheStrategy, chunk_days: int = config.settings.archive_chunk_days,
+                 workers: int = config.settings.archive_workers):
+        self.client = OpenMeteoClient(cache=cache)
+        self.chunk_days = chunk_days
+        self.workers = workers
+
+    @debug_log
+    def get_weather(self, location: Location, time_interval: str, duration: int) -> DataFrame:
+        start, end = self._date_range(duration=duration)
+        params = self._build_parameter(location=location, time_interval=time_interval, duration=duration)
+        timestamps = self._expected_timestamps(start=start, end=end, params=params)
+        columns = {}
+
+        # Filled while the chunks arrive, a decoded chunk is dropped right after its copy
+        with Metrics.measure("archive_stitch"):
+            for series in self.iter_weather_series(location=location, time_interval=time_interval,
+                                                   duration=duration, ordered=False):
+                offset = int(np.searchsorted(timestamps.asi8, series.timestamps.asi8[0]))
+                length = min(len(series), len(timestamps) - offset)
+                for name, values in series.columns.items():
+                    if name not in columns:
+                        columns[name] = np.full(len(timestamps), np.nan, dtype=values.dtype)
+                    columns[name][offset:offset + length] = values[:length]
+
+        return WeatherSeries(timestamps=timestamps, columns=columns).to_dataframe()
+
+    @debug_log
+    def get_weather_batch(self, locations: list[Location], time_interval: str, duration: int) -> DataFrame:
+        frames = [self.get_weather(location=location, time_interval=time_interval, duration=duration)
+                  for location in locations]
+        return pd.concat(frames, keys=range(len(frames)), names=["location", "timestamp"])
+
+    def iter_weather_series(self, location: Location, time_interval: str, duration: int,
+                            ordered: bool = True) -> Iterator[WeatherSeries]:
+        """
+        Yields the decoded chunks without stitching them, in date order unless ordered is False
+        """
+        params = self._build_parameter(location=location, time_interval=time_interval, duration=duration)
+        chunks = [{**params, "start_date": start.isoformat(), "end_date": end.isoformat()}
+                  for start, end in self._chunk_dates(*self._date_range(duration=duration))]
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="archive") as executor:
+            futures = [executor.submit(self._fetch_series, params=chunk) for chunk in chunks]
+            for future in (futures if ordered else as_completed(futures)):
+                yield future.result()
+
+    def _fetch_series(self, params: dict) -> WeatherSeries:
+        response = self.client.get_weather(params=params, url=config.settings.open_meteo_archive_url)
+        return self._decode(response=response, params=params)
+
+    @staticmethod
+    def _decode(response, params: dict) -> WeatherSeries:
+        if "daily" in params:
+            return OpenMeteoService._decode_series(variables=response.Daily(), params_order=params["daily"],
+                                                   column_names=daily_columns)
+        return OpenMeteoService._decode_series(variables=response.Hourly(), params_order=params["hourly"],
+                                               column_names=hourly_columns)
+
+    def _chunk_dates(self, start: date, end: date) -> list[tuple[date, date]]:
+        chunks = []
+        while start <= end:
+            chunk_end = min(start + timedelta(days=self.chunk_days - 1), end)
+            chunks.append((start, chunk_end))
+            start = chunk_end + timedelta(days=1)
+        return chunks
+
+    @staticmethod
+    def _date_range(duration) -> tuple[date, date]:
+        first, last = duration
+        if isinstance(first, int) and isinstance(last, int):
+            end = date.today() - timedelta(days=config.settings.archive_delay_days)
+            return end - timedelta(days=abs(first)), end
+        start, end = date.fromisoformat(str(first)), date.fromisoformat(str(last))
+        if start > end:
+            raise ValueError(f"Archive range starts after it ends: {start} > {end}")
+        return start, end
+
+    @staticmethod
+    def _expected_timestamps(start: date, end: date, params: dict) -> pd.DatetimeIndex:
+        """
+        The time axis of the whole range, days and hours start at local midnight like in the responses
+        """
+        first = pd.Timestamp(start).tz_localize(params["timezone"])
+        last = pd.Timestamp(end + timedelta(days=1)).tz_localize(params["timezone"])
+        # A calendar day, "D" would be 24 hours and drift by one hour at the clock changes
+        freq = pd.DateOffset(days=1) if "daily" in params else "h"
+        return pd.date_range(start=first, end=last, freq=freq, inclusive="left", name="timestamp").tz_convert("UTC")
+
+    @debug_log
+    def _build_parameter(self, location: Location, time_interval: str, duration: int) -> dict:
+        params = {
+            "latitude": _snap_coordinate(location.coordinates.latitude),
+            "longitude": _snap_coordinate(location.coordinates.longitude),
+            "timezone": "Europe/Berlin",
+        }
+        if time_interval == "days":
+            params["daily"] = config.settings.archive_daily_params
+        else:  # Hours
+            params["hourly"] = config.settings.archive_hourly_params
+        return params
+
+    @debug_log
+    def _handle_response(self, response, params: dict) -> DataFrame:
+        return self._decode(response=response, params=params).to_dataframe()
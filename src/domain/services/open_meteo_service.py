@@ -1,33 +1,310 @@
-from dataclasses import asdict
-from datetime import datetime, timedelta, timezone
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 from pandas import DataFrame
 
 import config.settings
 from config.logging_config import debug_log
+from config.metrics import Metrics, timed
 from domain.interface.weather_client_interface import WeatherClientInterface
 from domain.models.cache_strategy import CacheStrategy
 from domain.models.location import Location
-from domain.models.weather_data import WeatherData
+from domain.models.single_flight import SingleFlight
+from domain.models.time_series_store import TimeSeriesStore
+from domain.models.weather_series import WeatherSeries
+from domain.services.daily_aggregation import DailyAggregation
+from domain.services.range_planner import RangePlanner
 from infrastructure.api_clients.open_meteo_api import OpenMeteoClient
 
+# Column names of the DataFrame for each open-meteo parameter, the UI depends on those names
+hourly_columns = {
+    "apparent_temperature": "apparent_temperature_2m",
+    "showers": "shower",
+    "wind_direction_10m": "wind_direction_10m_dominant",
+    "wind_gusts_10m": "wind_gust_10m",
+}
+daily_columns = {
+    "wind_gusts_10m_min": "wind_gust_10m_min",
+    "wind_gusts_10m_max": "wind_gust_10m_max",
+    "wind_gusts_10m_mean": "wind_gust_10m_mean",
+    "relative_humidity_2m_min": "relative_humidity_min",
+    "relative_humidity_2m_max": "relative_humidity_max",
+    "relative_humidity_2m_mean": "relative_humidity_mean",
+}
+
+
+def _format_coordinate(value: float) -> str:
+    # 4 decimals are ~11 m, far below the resolution of any weather model, and keep the url short
+    return f"{value:.4f}"
+
+
+def _grid_step() -> float | None:
+    grid = config.settings.coordinate_grid
+    if isinstance(grid, str):
+        # COORDINATE_GRID="" or "none" is the None of the environment, exact coordinates
+        if grid.strip().lower() in ("", "none"):
+            return None
+        grid = config.settings.model_grids.get(grid) or float(grid)
+    return grid
+
+
+def _snap_coordinate(value: float) -> float:
+    """
+    Moves a coordinate to the nearest point of the model grid, open-meteo answers with that grid cell anyway
+    """
+    step = _grid_step()
+    if not step:
+        return value
+    return round(round(value / step) * step, 6)
+
+
+def _exact_coordinates(location: Location) -> tuple:
+    return round(location.coordinates.latitude, 4), round(location.coordinates.longitude, 4)
+
 
 class OpenMeteoService(WeatherClientInterface):
     def __init__(self, cache: CacheStrategy):
         self.client = OpenMeteoClient(cache=cache)
+        self.frame_cache = cache.frame_cache
+        self.range_planner = RangePlanner()
+        self.single_flight = SingleFlight.create()
+        self.store = TimeSeriesStore() if config.settings.time_series_store_dir else None
+        self._refresher = ThreadPoolExecutor(max_workers=config.settings.stale_refresh_workers,
+                                             thread_name_prefix="stale-refresh")
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
 
     @debug_log
     def get_weather(self, location: Location, time_interval: str, duration: int) -> DataFrame:
+        if time_interval == "days" and config.settings.derive_daily_from_hourly:
+            hourly = self.get_weather(location=location, time_interval="hours", duration=duration)
+            params = self._build_parameter(location=location, time_interval=time_interval, duration=duration)
+            with Metrics.measure("aggregate"):
+                daily = DailyAggregation.aggregate(df=hourly, timezone=params["timezone"])
+            daily.attrs.update(hourly.attrs)
+            return daily
+
+        params = self._build_parameter(location=location, time_interval=time_interval, duration=duration)
+        stored, recent_params = self._read_stored(params=params)
+        if stored is None:
+            df = self._get_frame(params=params, location=location)
+            if self.store is not None and params["past_days"]:
+                self.store.append(params=params, df=df)
+            return df
+        return self._join_stored(stored=stored, recent=self._get_frame(params=recent_params, location=location))
+
+    def _get_frame(self, params: dict, location: Location) -> DataFrame:
+        """
+        The frame for exactly these parameters from the frame cache, sliced from a wider one or fetched
+        """
+        # A narrower time span than an already fetched one is sliced out of the cached frame
+        covering_params = self.range_planner.covering_params(params=params)
+        if covering_params is not None:
+            covering_params = self._trim_stored(window=covering_params, params=params)
+            df = self._cached_frame(params=covering_params)
+            if df is not None:
+                self._count_snapped_hit(df=df, location=location)
+                return self.range_planner.slice(df=df, params=params)
+
+        fetch_params = self._plan(params=params)
+        df = self._cached_frame(params=fetch_params)
+        if df is None:
+            df = self.single_flight.do(("forecast", self.frame_cache.build_key(params=fetch_params)),
+                                       lambda: self._fetch(params=fetch_params,
+                                                           coordinates=_exact_coordinates(location)))
+            # Every caller waiting for the fetch gets its own frame, like a cache hit
+            df = df.copy(deep=False)
+        else:
+            self._count_snapped_hit(df=df, location=location)
+        self.range_planner.record(params=fetch_params)
+
+        if fetch_params == params:
+            return df
+        return self.range_planner.slice(df=df, params=params)
+
+    def _read_stored(self, params: dict) -> tuple[DataFrame | None, dict]:
+        """
+        The final past days the store holds and the parameters of the rest of the span, which is all that has to be
+        requested. (None, params) if the store does not hold all of them.
+        """
+        if self.store is None or not params["past_days"]:
+            return None, params
+        dates = self.store.final_dates(params=params)
+        stored = self.store.read(params=params, dates=dates)
+        if stored is None:
+            return None, params
+        return stored, {**params, "past_days": params["past_days"] - len(dates)}
+
+    @staticmethod
+    def _join_stored(stored: DataFrame, recent: DataFrame) -> DataFrame:
+        df = pd.concat([stored, recent])
+        df.attrs = dict(recent.attrs)
+        return df
+
+    def _plan(self, params: dict) -> dict:
+        return self._trim_stored(window=self.range_planner.plan(params=params), params=params)
+
+    def _trim_stored(self, window: dict, params: dict) -> dict:
+        """
+        Leaves the past days the store holds out of a window the range planner widened, they are never requested
+        again: not when the frame expires, is revalidated or refreshed. The window stays at least params.
+        """
+        if self.store is None or window["past_days"] <= params["past_days"]:
+            return window
+        dates = self.store.final_dates(params=window)
+        if not self.store.contains(params=window, dates=dates):
+            return window
+        return {**window, "past_days": max(params["past_days"], window["past_days"] - len(dates))}
+
+    @debug_log
+    def get_weather_batch(self, locations: list[Location], time_interval: str, duration: int) -> DataFrame:
+        """
+        Fetches many locations with as few requests as possible, open-meteo answers with one response per
+        coordinate in the order they were requested. The result is indexed by (location, timestamp), where
+        location is the position in the given list.
+        """
+        frames = [None] * len(locations)
+        keys = []
+        missing = []
+        first = {}  # key -> first missing location with it, locations in the same grid cell are requested once
+        for i, location in enumerate(locations):
+            params = self._build_parameter(location=location, time_interval=time_interval, duration=duration)
+            keys.append(self.frame_cache.build_key(params=params))
+            frames[i] = self.frame_cache.get(keys[i])
+            if frames[i] is not None:
+                self._count_snapped_hit(df=frames[i], location=location)
+            elif keys[i] not in first:
+                first[keys[i]] = i
+                missing.append(i)
+
+        # Only the locations that are not cached yet are requested
+        for chunk in self._chunk_locations(locations=[locations[i] for i in missing]):
+            params = self._build_batch_parameter(locations=chunk, time_interval=time_interval, duration=duration)
+            responses, fetched_at = self.client.fetch(params=params, url=config.settings.open_meteo_forecast_url)
+            if len(responses) != len(chunk):
+                raise ValueError(f"Expected {len(chunk)} responses from open-meteo, got {len(responses)}")
+            for response, i in zip(responses, missing[:len(chunk)]):
+                frames[i] = self._handle_response(response=response, params=params)
+                frames[i].attrs["coordinates"] = _exact_coordinates(locations[i])
+                self.frame_cache.set(keys[i], frames[i], fetched_at=fetched_at)
+            missing = missing[len(chunk):]
+
+        for i, key in enumerate(keys):
+            if frames[i] is None:
+                frames[i] = frames[first[key]]
+                self._count_snapped_hit(df=frames[i], location=locations[i])
+
+        return pd.concat(frames, keys=range(len(frames)), names=["location", "timestamp"])
+
+    @debug_log
+    def refresh(self, location: Location, time_interval: str, duration: int) -> DataFrame:
+        """
+        Re-fetches the frame that get_weather would be served from, including a wider one that covers it
+        """
+        if time_interval == "days" and config.settings.derive_daily_from_hourly:
+            time_interval = "hours"
         params = self._build_parameter(location=location, time_interval=time_interval, duration=duration)
-        response = self.client.get_weather(params=params, url="https://api.open-meteo.com/v1/forecast")
-        return self._handle_response(response=response, params=params)
+        # Stored days are final, only the rest of the span is fetched again
+        stored, recent_params = self._read_stored(params=params)
+        fetch_params = self._plan(params=recent_params)
+        df = self._fetch(params=fetch_params, force_refresh=True, coordinates=_exact_coordinates(location))
+        self.range_planner.record(params=fetch_params)
+        if stored is None:
+            return df
+        return self._join_stored(stored=stored, recent=self.range_planner.slice(df=df, params=recent_params))
+
+    def close(self) -> None:
+        self._refresher.shutdown(wait=False, cancel_futures=True)
+
+    def _cached_frame(self, params: dict) -> DataFrame | None:
+        """
+        Returns the cached frame, a stale one is returned as well and refreshed in the background
+        """
+        df, stale = self.frame_cache.lookup(self.frame_cache.build_key(params=params))
+        if stale:
+            self._revalidate(params=params, coordinates=df.attrs.get("coordinates"))
+        return df
+
+    def _fetch(self, params: dict, force_refresh: bool = False, coordinates: tuple = None) -> DataFrame:
+        """
+        Fetches and caches a frame, coordinates are the exact ones of the location that asked for it
+        """
+        responses, fetched_at = self.client.fetch(params=params, url=config.settings.open_meteo_forecast_url,
+                                                  force_refresh=force_refresh)
+        df = self._handle_response(response=responses[0], params=params)
+        df.attrs["coordinates"] = coordinates
+        # A stale http cache entry keeps its age, the frame is revalidated instead of passing for a fresh one
+        self.frame_cache.set(self.frame_cache.build_key(params=params), df, fetched_at=fetched_at)
+        if not force_refresh and fetched_at + self.frame_cache.expire_after <= time.time():
+            self._revalidate(params=params, coordinates=coordinates)
+        return df.copy(deep=False)  # the cached frame itself is never handed out, callers may add columns
+
+    @staticmethod
+    def _count_snapped_hit(df: DataFrame, location: Location) -> None:
+        # A hit on a frame fetched for other coordinates of the same grid cell would have been a miss without snapping
+        coordinates = df.attrs.get("coordinates")
+        if coordinates is not None and tuple(coordinates) != _exact_coordinates(location):
+            Metrics.count("grid_snap_hits")
+
+    def _revalidate(self, params: dict, coordinates: tuple = None) -> None:
+        key = self.frame_cache.build_key(params=params)
+        with self._refreshing_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                Metrics.count("stale_refreshes")
+                self._fetch(params=params, force_refresh=True, coordinates=coordinates)
+            except Exception as e:  # the stale frame stays until the next attempt
+                logging.getLogger(__name__).warning(f"Background refresh failed: {e}")
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(key)
+
+        self._refresher.submit(refresh)
+
+    @staticmethod
+    @debug_log
+    def _chunk_locations(locations: list[Location]) -> list[list[Location]]:
+        """
+        Packs the locations into chunks that stay below the location and url length limits
+        """
+        chunks = []
+        chunk = []
+        coordinates_length = 0
+        for location in locations:
+            length = len(_format_coordinate(location.coordinates.latitude)) + len(
+                _format_coordinate(location.coordinates.longitude)) + 6  # url encoded separators
+            if chunk and (len(chunk) >= config.settings.batch_max_locations
+                          or coordinates_length + length > config.settings.batch_max_coordinates_length):
+                chunks.append(chunk)
+                chunk = []
+                coordinates_length = 0
+            chunk.append(location)
+            coordinates_length += length
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    @staticmethod
+    def columns(time_interval: str) -> list[str]:
+        """
+        Columns of a frame for the configured parameters, before variables without any value are dropped
+        """
+        if time_interval == "days":
+            return [daily_columns.get(param, param) for param in config.settings.daily_params]
+        return [hourly_columns.get(param, param) for param in config.settings.hourly_params]
 
     @debug_log
     def _build_parameter(self, location: Location, time_interval: str, duration: int) -> dict:
         params = {
-            "latitude": location.coordinates.latitude,
-            "longitude": location.coordinates.longitude,
+            "latitude": _snap_coordinate(location.coordinates.latitude),
+            "longitude": _snap_coordinate(location.coordinates.longitude),
             "timezone": "Europe/Berlin",
             "forecast_days": abs(duration[1]),
             "past_days": abs(duration[0])
@@ -41,135 +318,62 @@ class OpenMeteoService(WeatherClientInterface):
             params["hourly"] = config.settings.hourly_params
         return params
 
+    @debug_log
+    def _build_batch_parameter(self, locations: list[Location], time_interval: str, duration: int) -> dict:
+        params = self._build_parameter(location=locations[0], time_interval=time_interval, duration=duration)
+        params["latitude"] = ",".join(_format_coordinate(_snap_coordinate(location.coordinates.latitude))
+                                      for location in locations)
+        params["longitude"] = ",".join(_format_coordinate(_snap_coordinate(location.coordinates.longitude))
+                                       for location in locations)
+        return params
+
     @debug_log
     def _handle_response(self, response, params: dict) -> DataFrame:
         if isinstance(response, list):
             response = response[0]
 
         if "daily" in params:
-            weather_data = self._daily_data_handling(response=response, params=params)
+            return self._columnar_data_handling(variables=response.Daily(), params_order=params["daily"],
+                                                column_names=daily_columns)
         elif "hourly" in params:
-            weather_data = self._hourly_data_handling(response=response, params=params)
+            return self._columnar_data_handling(variables=response.Hourly(), params_order=params["hourly"],
+                                                column_names=hourly_columns)
         else:
             raise ValueError("Unexpected response parameters")
 
-        return self._dictionary_to_dataframe(weather_data=weather_data)
-
     @staticmethod
     @debug_log
-    def _dictionary_to_dataframe(weather_data: list) -> DataFrame:
-        data = [asdict(weather) for weather in weather_data]
-        df = pd.DataFrame(data)
-        df.set_index("timestamp", inplace=True)
-        df.dropna(how='all', axis=1, inplace=True)
-        return df
+    def _build_timestamps(variables) -> pd.DatetimeIndex:
+        return pd.date_range(
+            start=pd.to_datetime(variables.Time(), unit="s", utc=True),
+            end=pd.to_datetime(variables.TimeEnd(), unit="s", utc=True),
+            freq=pd.Timedelta(seconds=variables.Interval()),
+            inclusive="left",
+            name="timestamp"
+        )
 
     @staticmethod
     @debug_log
-    def _hourly_data_handling(response, params: dict) -> list[WeatherData]:
-        hourly = response.Hourly()
-
-        start_time = datetime.fromtimestamp(hourly.Time(), tz=timezone.utc)
-        end_time = datetime.fromtimestamp(hourly.TimeEnd(), tz=timezone.utc)
-        interval = hourly.Interval()
-
-        timestamps = []
-        current_time = start_time
-        while current_time < end_time:
-            timestamps.append(current_time)
-            current_time += timedelta(seconds=interval)
-
-        # Extract all hourly variables in order
-        variables = []
-        for i in range(len(params["hourly"])):
-            var = hourly.Variables(i).ValuesAsNumpy()
-            variables.append(var)
-
-        weather_data_list = []
-        params_order = config.settings.hourly_params
-        for i in range(len(timestamps)):
-            current_values = [var[i] for var in variables]
-            data = dict(zip(params_order, current_values))
-
-            # Create WeatherData instance
-            weather_data = WeatherData(
-                timestamp=timestamps[i],
-                temperature_2m=data.get("temperature_2m"),
-                weather_code=data.get("weather_code"),
-                apparent_temperature_2m=data.get("apparent_temperature"),
-                relative_humidity_2m=data.get("relative_humidity_2m"),
-                snowfall=data.get("snowfall"),
-                shower=data.get("showers"),
-                rain=data.get("rain"),
-                cloud_cover_low=data.get("cloud_cover_low"),
-                cloud_cover_mid=data.get("cloud_cover_mid"),
-                cloud_cover_high=data.get("cloud_cover_high"),
-                cloud_cover=data.get("cloud_cover"),
-                visibility=data.get("visibility"),
-                wind_speed_10m=data.get("wind_speed_10m"),
-                wind_direction_10m_dominant=data.get("wind_direction_10m"),
-                wind_gust_10m=data.get("wind_gusts_10m")
-            )
-            weather_data_list.append(weather_data)
-
-        return weather_data_list
+    def _columnar_data_handling(variables, params_order: list, column_names: dict) -> DataFrame:
+        series = OpenMeteoService._decode_series(variables=variables, params_order=params_order,
+                                                 column_names=column_names)
+        with Metrics.measure("dataframe"):
+            return series.to_dataframe()
 
     @staticmethod
+    @timed("decode")
     @debug_log
-    def _daily_data_handling(response, params: dict) -> list[WeatherData]:
-        daily = response.Daily()
-
-        start_time = datetime.fromtimestamp(daily.Time(), tz=timezone.utc)
-        end_time = datetime.fromtimestamp(daily.TimeEnd(), tz=timezone.utc)
-        interval = daily.Interval()
-
-        timestamps = []
-        current_time = start_time
-        while current_time < end_time:
-            timestamps.append(current_time)
-            current_time += timedelta(seconds=interval)
-
-        # Extract all hourly variables in order
-        variables = []
-        for i in range(len(params["daily"])):
-            var = daily.Variables(i).ValuesAsNumpy()
-            variables.append(var)
-
-        weather_data_list = []
-        params_order = config.settings.daily_params
-        for i in range(len(timestamps)):
-            current_values = [var[i] for var in variables]
-            data = dict(zip(params_order, current_values))
-
-            weather_data = WeatherData(
-                timestamp=timestamps[i],
-                temperature_2m_max=data.get("temperature_2m_max"),
-                temperature_2m_min=data.get("temperature_2m_min"),
-                weather_code=data.get("weather_code"),
-                apparent_temperature_max=data.get("apparent_temperature_max"),
-                apparent_temperature_min=data.get("apparent_temperature_min"),
-                apparent_temperature_mean=data.get("apparent_temperature_mean"),
-                temperature_2m_mean=data.get("temperature_2m_mean"),
-                rain_sum=data.get("rain_sum"),
-                showers_sum=data.get("showers_sum"),
-                snowfall_sum=data.get("snowfall_sum"),
-                wind_speed_10m_max=data.get("wind_speed_10m_max"),
-                wind_direction_10m_dominant=data.get("wind_direction_10m_dominant"),
-                visibility_max=data.get("visibility_max"),
-                visibility_min=data.get("visibility_min"),
-                visibility_mean=data.get("visibility_mean"),
-                wind_speed_10m_mean=data.get("wind_speed_10m_mean"),
-                wind_speed_10m_min=data.get("wind_speed_10m_min"),
-                wind_gust_10m_min=data.get("wind_gusts_10m_min"),
-                wind_gust_10m_max=data.get("wind_gusts_10m_max"),
-                wind_gust_10m_mean=data.get("wind_gusts_10m_mean"),
-                relative_humidity_min=data.get("relative_humidity_2m_min"),
-                relative_humidity_max=data.get("relative_humidity_2m_max"),
-                relative_humidity_mean=data.get("relative_humidity_2m_mean"),
-                cloud_cover_mean=data.get("cloud_cover_mean"),
-                cloud_cover_max=data.get("cloud_cover_max"),
-                cloud_cover_min=data.get("cloud_cover_min")
-            )
-            weather_data_list.append(weather_data)
-
-        return weather_data_list
+    def _decode_series(variables, params_order: list, column_names: dict) -> WeatherSeries:
+        """
+        Decodes the flatbuffer variables column by column. ValuesAsNumpy returns read-only views into the response
+        body, each column is copied once so that the frames own writable arrays and do not keep the whole body
+        (of every location of a batch) alive in the frame cache
+        """
+        series = WeatherSeries(timestamps=OpenMeteoService._build_timestamps(variables=variables))
+
+        for i, param in enumerate(params_order):
+            values = variables.Variables(i).ValuesAsNumpy()
+            series.add(column_names.get(param, param), values[:len(series)].copy())
+
+        series.drop_empty()
+        return series
@@ -0,0 +1,70 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from pandas import DataFrame
+
+from domain.models.frame_cache import FrameCache
+
+
+class RangePlanner:
+    """
+    Remembers the widest past_days/forecast_days window fetched per location and parameter set, so that a
+    narrower window is sliced out of the cached frame instead of being requested again.
+    Windows are only valid for the local day they were fetched on, open-meteo counts days from today.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._windows = OrderedDict()  # base key -> (local date, past_days, forecast_days)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _base_key(params: dict) -> tuple:
+        return FrameCache.build_key({name: value for name, value in params.items()
+                                     if name not in ("past_days", "forecast_days")})
+
+    @staticmethod
+    def _today(params: dict) -> pd.Timestamp:
+        return pd.Timestamp.now(tz=params.get("timezone", "UTC")).normalize()
+
+    def covering_params(self, params: dict) -> dict | None:
+        """
+        Returns the parameters of an already fetched window containing the requested one
+        """
+        with self._lock:
+            window = self._windows.get(self._base_key(params=params))
+        if window is None:
+            return None
+        date, past_days, forecast_days = window
+        if date != self._today(params=params):
+            return None
+        if params["past_days"] > past_days or params["forecast_days"] > forecast_days:
+            return None
+        return {**params, "past_days": past_days, "forecast_days": forecast_days}
+
+    def plan(self, params: dict) -> dict:
+        """
+        Widens the requested window to the union with the known one, so that going back to the previous
+        range afterwards is served from the cache as well
+        """
+        with self._lock:
+            window = self._windows.get(self._base_key(params=params))
+        if window is None or window[0] != self._today(params=params):
+            return params
+        return {**params, "past_days": max(params["past_days"], window[1]),
+                "forecast_days": max(params["forecast_days"], window[2])}
+
+    def record(self, params: dict) -> None:
+        key = self._base_key(params=params)
+        with self._lock:
+            self._windows[key] = (self._today(params=params), params["past_days"], params["forecast_days"])
+            self._windows.move_to_end(key)
+            while len(self._windows) > self.max_entries:
+                self._windows.popitem(last=False)
+
+    def slice(self, df: DataFrame, params: dict) -> DataFrame:
+        today = self._today(params=params)
+        start = today - pd.Timedelta(days=params["past_days"])
+        end = today + pd.Timedelta(days=params["forecast_days"])
+        return df[(df.index >= start) & (df.index < end)]
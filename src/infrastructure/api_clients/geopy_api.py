@@ -1,14 +1,28 @@
 # noinspection PyUnresolvedReferences
+from geopy.extra.rate_limiter import RateLimiter
+# noinspection PyUnresolvedReferences
 from geopy.geocoders import Nominatim
 
 from config.logging_config import debug_log
-from config.settings import agent_name
-from domain.models.location import Coordinates, Location
+from config.metrics import timed
+from config.settings import agent_name, nominatim_domain, nominatim_min_delay, nominatim_scheme
+from domain.models.gazetteer import Gazetteer
+from domain.models.geocode_cache import GeocodeCache
+from domain.models.location import Coordinates, Location, LocationNotFoundError
+from domain.models.single_flight import SingleFlight
+from utils.normalization import Normalization
 
 
 class GeoLocationClient:
-    def __init__(self):
-        self.geo_client = Nominatim(user_agent=agent_name)
+    def __init__(self, cache: GeocodeCache | None = None, single_flight: SingleFlight | None = None,
+                 gazetteer: Gazetteer | None = None):
+        self.geo_client = Nominatim(user_agent=agent_name, domain=nominatim_domain, scheme=nominatim_scheme)
+        # Spaces the requests of all threads by nominatim_min_delay seconds, errors are not retried here
+        self.geocode = RateLimiter(self.geo_client.geocode, min_delay_seconds=nominatim_min_delay, max_retries=0,
+                                   swallow_exceptions=False)
+        self.cache = cache
+        self.gazetteer = gazetteer
+        self.single_flight = single_flight or SingleFlight.create()
 
     @debug_log
     def get_coordinates(self, location: Location) -> Coordinates:
@@ -19,10 +33,40 @@ class GeoLocationClient:
         ]
         address = ", ".join(filter(None, address_parts))
 
-        response = self.geo_client.geocode(address)
+        # The local gazetteer answers in memory, Nominatim is only asked for addresses missing there
+        if self.gazetteer is not None:
+            coordinates = self.gazetteer.lookup(location=location)
+            if coordinates is not None:
+                return coordinates
+
+        key = Normalization.normalize_address(location=location)
+        if self.cache is None:
+            coordinates = self.single_flight.do(("geocode", key), lambda: self._geocode(address=address))
+        else:
+            found, coordinates = self.cache.get(key)
+            if not found:
+                coordinates = self.single_flight.do(("geocode", key),
+                                                    lambda: self._geocode_cached(key=key, address=address))
+
+        if coordinates is None:
+            raise LocationNotFoundError(f"Location not found: {address}")
+        return coordinates
+
+    def _geocode_cached(self, key: str, address: str) -> Coordinates | None:
+        # Another process holding the lock before may have stored it meanwhile
+        found, coordinates = self.cache.get(key)
+        if not found:
+            coordinates = self._geocode(address=address)
+            self.cache.set(key, coordinates)  # None is cached as well, Nominatim would answer the same
+        return coordinates
+
+    @timed("geocode")
+    @debug_log
+    def _geocode(self, address: str) -> Coordinates | None:
+        response = self.geocode(address)
 
         if not response:
-            raise ValueError(f"Location not found: {address}")
+            return None
 
         return Coordinates(
             latitude=response.latitude,
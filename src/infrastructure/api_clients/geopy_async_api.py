@@ -0,0 +1,68 @@
+# noinspection PyUnresolvedReferences
+from geopy.adapters import AioHTTPAdapter
+# noinspection PyUnresolvedReferences
+from geopy.extra.rate_limiter import AsyncRateLimiter
+# noinspection PyUnresolvedReferences
+from geopy.geocoders import Nominatim
+
+from config.logging_config import debug_log
+from config.metrics import Metrics
+from config.settings import agent_name, nominatim_domain, nominatim_min_delay, nominatim_scheme
+from domain.models.geocode_cache import GeocodeCache
+from domain.models.location import Coordinates, Location, LocationNotFoundError
+from utils.normalization import Normalization
+
+
+class AsyncGeoLocationClient:
+    def __init__(self, cache: GeocodeCache | None = None):
+        self.cache = cache
+        self.geo_client = None
+        self.geocode = None
+
+    async def __aenter__(self):
+        self.geo_client = Nominatim(user_agent=agent_name, domain=nominatim_domain, scheme=nominatim_scheme,
+                                    adapter_factory=AioHTTPAdapter)
+        await self.geo_client.__aenter__()
+        # Spaces the requests by nominatim_min_delay seconds whatever the concurrency, errors are not retried here
+        self.geocode = AsyncRateLimiter(self.geo_client.geocode, min_delay_seconds=nominatim_min_delay,
+                                        max_retries=0, swallow_exceptions=False)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.geo_client.__aexit__(exc_type, exc_value, traceback)
+        self.geo_client = None
+        self.geocode = None
+
+    @debug_log
+    async def get_coordinates(self, location: Location) -> Coordinates:
+        address_parts = [
+            location.city,
+            location.postal_code,
+            location.country
+        ]
+        address = ", ".join(filter(None, address_parts))
+
+        if self.cache is None:
+            coordinates = await self._geocode(address=address)
+        else:
+            key = Normalization.normalize_address(location=location)
+            found, coordinates = self.cache.get(key)
+            if not found:
+                coordinates = await self._geocode(address=address)
+                self.cache.set(key, coordinates)
+
+        if coordinates is None:
+            raise LocationNotFoundError(f"Location not found: {address}")
+        return coordinates
+
+    async def _geocode(self, address: str) -> Coordinates | None:
+        with Metrics.measure("geocode"):
+            response = await self.geocode(address)
+
+        if not response:
+            return None
+
+        return Coordinates(
+            latitude=response.latitude,
+            longitude=response.longitude
+        )
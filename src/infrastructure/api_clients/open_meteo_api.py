@@ -1,13 +1,53 @@
-import openmeteo_requests
+import time
+
+from openmeteo_requests.Client import OpenMeteoRequestsError
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
 
 from config.logging_config import debug_log
+from config.metrics import timed
 from domain.models.cache_strategy import CacheStrategy
 
 
 class OpenMeteoClient:
     def __init__(self, cache: CacheStrategy):
-        self.client = openmeteo_requests.Client(session=cache.retry_session)
+        self.session = cache.retry_session
+
+    @debug_log
+    def get_weather(self, url, params: dict, force_refresh: bool = False):
+        responses, _ = self.fetch(url=url, params=params, force_refresh=force_refresh)
+        return responses[0]
 
     @debug_log
-    def get_weather(self, url, params: dict):
-        return self.client.weather_api(url, params)[0]
+    def get_weather_batch(self, url, params: dict) -> list:
+        responses, _ = self.fetch(url=url, params=params)
+        return responses
+
+    @timed("http")
+    def fetch(self, url, params: dict, force_refresh: bool = False) -> tuple[list[WeatherApiResponse], float]:
+        """
+        The responses and when they were fetched from upstream (epoch seconds). A response served by the http
+        cache, stale ones included, is as old as its cache entry and not as this call. force_refresh bypasses
+        the http cache. Same request and errors as openmeteo_requests.Client.weather_api.
+        """
+        response = self.session.get(url, params={**params, "format": "flatbuffers"}, force_refresh=force_refresh)
+        if response.status_code in (400, 429):
+            raise OpenMeteoRequestsError(response.json())
+        response.raise_for_status()
+
+        created_at = getattr(response, "created_at", None)
+        return self.decode(data=response.content), created_at.timestamp() if created_at else time.time()
+
+    @staticmethod
+    def decode(data: bytes) -> list[WeatherApiResponse]:
+        """
+        Splits a raw flatbuffers body into its responses, same framing as openmeteo_requests:
+        every message is prefixed with its length
+        """
+        messages = []
+        total = len(data)
+        pos = 0
+        while pos < total:
+            length = int.from_bytes(data[pos: pos + 4], byteorder="little")
+            messages.append(WeatherApiResponse.GetRootAs(data, pos + 4))
+            pos += length + 4
+        return messages
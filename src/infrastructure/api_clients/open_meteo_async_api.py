@@ -0,0 +1,43 @@
+import asyncio
+
+import aiohttp
+from openmeteo_requests.Client import OpenMeteoRequestsError
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+
+from config.logging_config import debug_log
+from config.metrics import Metrics
+from config.settings import retries_cache, backoff_factor_cache
+from infrastructure.api_clients.open_meteo_api import OpenMeteoClient
+
+
+class AsyncOpenMeteoClient:
+    def __init__(self, session: aiohttp.ClientSession, retries: int = retries_cache,
+                 backoff_factor: float = backoff_factor_cache):
+        self.session = session
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+
+    @debug_log
+    async def get_weather(self, url, params: dict) -> list[WeatherApiResponse]:
+        query = self._encode_params(params=params)
+        for attempt in range(self.retries + 1):
+            try:
+                with Metrics.measure("http"):
+                    async with self.session.get(url, params=query) as response:
+                        if response.status in [400, 429]:
+                            raise OpenMeteoRequestsError(await response.json())
+                        response.raise_for_status()
+                        return OpenMeteoClient.decode(data=await response.read())
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+                Metrics.count("http_retries")
+                await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    @staticmethod
+    def _encode_params(params: dict) -> dict:
+        # aiohttp only accepts strings, lists are sent comma separated which open-meteo understands as well
+        query = {key: ",".join(map(str, value)) if isinstance(value, list) else str(value)
+                 for key, value in params.items()}
+        query["format"] = "flatbuffers"
+        return query
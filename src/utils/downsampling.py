@@ -0,0 +1,44 @@
+import numpy as np
+
+
+class Downsampling:
+    @staticmethod
+    def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+        """
+        Largest-Triangle-Three-Buckets, returns the sorted indices of the points that keep the visual shape
+        of the series: per bucket the point spanning the largest triangle with its neighbours is kept
+        """
+        n = len(y)
+        if threshold >= n or threshold < 3:
+            return np.arange(n)
+
+        x = np.asarray(x, dtype=np.float64)
+        y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+        # First and last point are always kept, the ones between are split into threshold - 2 buckets
+        edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+        indices = np.empty(threshold, dtype=np.int64)
+        indices[0] = 0
+        indices[-1] = n - 1
+
+        previous = 0
+        for i in range(threshold - 2):
+            start, end = edges[i], edges[i + 1]
+            # The average of the next bucket stands in for the point not chosen yet
+            next_end = edges[i + 2] if i + 2 < len(edges) else n
+            next_x = x[end:next_end].mean() if next_end > end else x[-1]
+            next_y = y[end:next_end].mean() if next_end > end else y[-1]
+
+            areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                           - (x[previous] - x[start:end]) * (next_y - y[previous]))
+            previous = start + int(np.argmax(areas))
+            indices[i + 1] = previous
+        return indices
+
+    @staticmethod
+    def lttb_columns(x: np.ndarray, columns: list[np.ndarray], threshold: int) -> np.ndarray:
+        """
+        Union of the points kept for each column, so that one x-axis carries the extremes of every series
+        """
+        if len(x) <= threshold:
+            return np.arange(len(x))
+        return np.unique(np.concatenate([Downsampling.lttb(x=x, y=y, threshold=threshold) for y in columns]))
@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class KdTree:
+    """
+    Static KD-tree stored implicitly in the order of its points: every segment is split at its median along the
+    axes in turn, the median point sits in the middle of the segment. No nodes are stored, build returns the
+    permutation that puts the points into tree order and the tree is created from the permuted points.
+    """
+
+    def __init__(self, points: np.ndarray, leaf_size: int = 16):
+        self.points = points  # (n, dims), already in tree order
+        self.leaf_size = leaf_size
+
+    @staticmethod
+    def build(points: np.ndarray, leaf_size: int = 16) -> np.ndarray:
+        """
+        The order of points that makes them a tree, segments of at most leaf_size points stay unsorted
+        """
+        dims = points.shape[1]
+        order = np.arange(len(points))
+        stack = [(0, len(points), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= leaf_size:
+                continue
+            mid = (lo + hi) // 2
+            segment = order[lo:hi]
+            # Only the median has to be in place, both halves stay unsorted
+            order[lo:hi] = segment[np.argpartition(points[segment, depth % dims], mid - lo)]
+            stack.append((lo, mid, depth + 1))
+            stack.append((mid + 1, hi, depth + 1))
+        return order
+
+    def nearest(self, point: np.ndarray) -> tuple[int, float]:
+        """
+        Index of the point closest to point and the squared euclidean distance to it
+        """
+        points = self.points
+        dims = points.shape[1]
+        best, best_distance = -1, np.inf
+        stack = [(0, len(points), 0, 0.0)]
+        while stack:
+            lo, hi, depth, bound = stack.pop()
+            if bound >= best_distance or lo >= hi:
+                continue
+            if hi - lo <= self.leaf_size:
+                distances = ((points[lo:hi] - point) ** 2).sum(axis=1)
+                i = int(distances.argmin())
+                if distances[i] < best_distance:
+                    best, best_distance = lo + i, float(distances[i])
+                continue
+
+            mid = (lo + hi) // 2
+            distance = float(((points[mid] - point) ** 2).sum())
+            if distance < best_distance:
+                best, best_distance = mid, distance
+            axis = depth % dims
+            diff = float(point[axis] - points[mid, axis])
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            # The far side can only be closer than the splitting plane, the near side is searched first
+            stack.append((*far, depth + 1, diff * diff))
+            stack.append((*near, depth + 1, bound))
+        return best, best_distance
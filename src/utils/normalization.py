@@ -0,0 +1,31 @@
+import re
+import unicodedata
+
+from domain.models.location import Location
+
+# German umlauts are folded the way they are usually typed without a German keyboard
+_transliterations = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+_whitespace = re.compile(r"\s+")
+
+
+class Normalization:
+    @staticmethod
+    def normalize_text(text: str | None) -> str:
+        if not text:
+            return ""
+        text = text.casefold().translate(_transliterations)
+        # Strip remaining accents (é -> e), so that "Zürich " and "Zuerich" share a key and "Genève" matches "Geneve".
+        # "Zurich" stays a key of its own, folding "ue" to "u" would also change names like "Manuel"
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text if not unicodedata.combining(char))
+        text = text.replace(",", " ")
+        return _whitespace.sub(" ", text).strip()
+
+    @staticmethod
+    def normalize_address(location: Location) -> str:
+        address_parts = [
+            Normalization.normalize_text(location.city),
+            Normalization.normalize_text(location.postal_code),
+            Normalization.normalize_text(location.country)
+        ]
+        return "|".join(address_parts)
@@ -1,5 +1,5 @@
 from config.logging_config import debug_log
-from domain.models.location import Location
+from domain.models.location import Location, LocationNotFoundError
 
 
 class Validation:
@@ -7,7 +7,7 @@ class Validation:
     @debug_log
     def validate_location(location: Location) -> bool:
         if location.coordinates is None:
-            raise ValueError(f"Location not found. Please verify the details:\n{location}")
+            raise LocationNotFoundError(f"Location not found. Please verify the details:\n{location}")
         return True
 
     @staticmethod
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The app is imported from src like in the Streamlit entry point, the fixtures from benchmarks
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(root, "src"), os.path.join(root, "benchmarks")]
@@ -0,0 +1,59 @@
+"""
+DailyAggregation against a pair of hourly and daily responses for the same location and days
+(benchmarks/fixtures, see flatbuffer_fixtures.py). The checked-in pairs are synthetic, their daily values come from
+reference_daily; recorded ones (--record) are compared the same way and decide derive_daily_from_hourly.
+
+Tolerance: the responses carry float32 values, so extrema and sums have to match within 1e-3 absolute or 1e-4
+relative, means within 1e-4 relative, the dominant direction within 0.1 degrees and weather_code exactly.
+"""
+import numpy as np
+import pytest
+
+import config.settings
+from domain.services.daily_aggregation import DailyAggregation
+from domain.services.open_meteo_service import OpenMeteoService, daily_columns, hourly_columns
+from flatbuffer_fixtures import load_fixtures
+from infrastructure.api_clients.open_meteo_api import OpenMeteoClient
+
+fixtures = {(entry["interval"], entry["forecast_days"], entry["locations"]): entry["data"]
+            for entry in load_fixtures()}
+pairs = sorted((days, locations) for interval, days, locations in fixtures
+               if interval == "hourly" and ("daily", days, locations) in fixtures)
+
+
+def decode(data: bytes, interval: str) -> list:
+    frames = []
+    for response in OpenMeteoClient.decode(data=data):
+        if interval == "daily":
+            frames.append(OpenMeteoService._columnar_data_handling(
+                variables=response.Daily(), params_order=config.settings.daily_params, column_names=daily_columns))
+        else:
+            frames.append(OpenMeteoService._columnar_data_handling(
+                variables=response.Hourly(), params_order=config.settings.hourly_params, column_names=hourly_columns))
+    return frames
+
+
+@pytest.mark.parametrize("days, locations", pairs)
+def test_derived_daily_matches_upstream(days, locations):
+    timezone = OpenMeteoClient.decode(data=fixtures[("hourly", days, locations)])[0].Timezone().decode()
+    hourly_frames = decode(fixtures[("hourly", days, locations)], interval="hourly")
+    daily_frames = decode(fixtures[("daily", days, locations)], interval="daily")
+    assert len(hourly_frames) == len(daily_frames) == locations
+
+    for hourly, upstream in zip(hourly_frames, daily_frames):
+        derived = DailyAggregation.aggregate(df=hourly, timezone=timezone)
+        assert derived.index.equals(upstream.index)
+        assert set(upstream.columns) <= set(derived.columns)
+
+        for column in upstream.columns:
+            expected = upstream[column].to_numpy(dtype=np.float64)
+            actual = derived[column].to_numpy(dtype=np.float64)
+            if column == "weather_code":
+                np.testing.assert_array_equal(actual, expected, err_msg=column)
+            elif column.endswith("_dominant"):
+                difference = np.abs((actual - expected + 180) % 360 - 180)
+                assert difference.max() <= 0.1, column
+            elif column.endswith("_mean"):
+                np.testing.assert_allclose(actual, expected, rtol=1e-4, err_msg=column)
+            else:
+                np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-3, err_msg=column)
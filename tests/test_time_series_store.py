@@ -0,0 +1,100 @@
+"""
+The time series store, the range planner and the frame cache together: once the store holds the final past days
+of a location, they are left out of every request, including the ones after the frame expired, was revalidated
+or refreshed. The forecast endpoint is replaced by a client answering with synthetic flatbuffers.
+"""
+import time
+
+import pandas as pd
+import pytest
+
+from domain.models.cache_strategy import CacheStrategy
+from domain.models.location import Coordinates, Location
+from domain.models.time_series_store import TimeSeriesStore
+from domain.services.open_meteo_service import OpenMeteoService
+from flatbuffer_fixtures import synthesize
+from infrastructure.api_clients.open_meteo_api import OpenMeteoClient
+
+
+class RecordingClient:
+    def __init__(self):
+        self.requests = []
+
+    def fetch(self, url, params: dict, force_refresh: bool = False) -> tuple[list, float]:
+        self.requests.append({**params, "force_refresh": force_refresh})
+        today = pd.Timestamp.now(tz=params["timezone"]).normalize()
+        start_time = int((today - pd.Timedelta(days=params["past_days"])).timestamp())
+        data = synthesize(interval="hourly", days=params["past_days"] + params["forecast_days"], locations=1,
+                          start_time=start_time)
+        return OpenMeteoClient.decode(data=data), time.time()
+
+
+@pytest.fixture
+def service(tmp_path):
+    cache = CacheStrategy(name_cache=str(tmp_path / "http_cache"), backend="memory")
+    service = OpenMeteoService(cache=cache)
+    service.client = RecordingClient()
+    # Every past day is final at once (yesterday included), independent of the time the tests run at
+    service.store = TimeSeriesStore(root_dir=str(tmp_path / "store"), final_delay=0)
+    yield service
+    service.close()
+    cache.close()
+
+
+location = Location(country="Germany", city="Saarbrücken", postal_code="66111",
+                    coordinates=Coordinates(latitude=49.24, longitude=6.99))
+
+
+def past_days(service) -> list[int]:
+    return [params["past_days"] for params in service.client.requests]
+
+
+def test_stored_days_are_not_requested_again(service):
+    first = service.get_weather(location=location, time_interval="hours", duration=(-7, 1))
+    service.frame_cache.clear()
+    second = service.get_weather(location=location, time_interval="hours", duration=(-7, 1))
+
+    # The store holds all 7 past days, only today is requested
+    assert past_days(service) == [7, 0]
+    assert second.index.equals(first.index)
+
+
+def test_planner_does_not_widen_back_to_stored_days(service):
+    service.get_weather(location=location, time_interval="hours", duration=(-7, 1))
+    service.frame_cache.clear()
+    # The planner knows the 7 day window, but the stored days are left out of the widened one
+    service.get_weather(location=location, time_interval="hours", duration=(0, 1))
+    service.get_weather(location=location, time_interval="hours", duration=(-3, 1))
+
+    assert past_days(service) == [7, 0]
+
+
+def test_expired_frame_is_revalidated_without_stored_days(service):
+    service.frame_cache.expire_after = 1
+    service.get_weather(location=location, time_interval="hours", duration=(-7, 1))
+    service.get_weather(location=location, time_interval="hours", duration=(-7, 1))
+    time.sleep(1.1)
+    # Expired and still within the stale period: served stale and revalidated in the background
+    service.get_weather(location=location, time_interval="hours", duration=(-7, 1))
+    service._refresher.shutdown(wait=True)
+
+    assert past_days(service) == [7, 0, 0]
+    assert service.client.requests[-1]["force_refresh"]
+
+
+def test_refresh_only_fetches_the_recent_days(service):
+    first = service.get_weather(location=location, time_interval="hours", duration=(-7, 1))
+    refreshed = service.refresh(location=location, time_interval="hours", duration=(-7, 1))
+
+    assert service.client.requests[-1]["past_days"] == 0
+    assert service.client.requests[-1]["force_refresh"]
+    assert refreshed.index.equals(first.index)
+
+
+def test_without_store_the_full_window_is_requested(service):
+    service.store = None
+    service.get_weather(location=location, time_interval="hours", duration=(-7, 1))
+    service.frame_cache.clear()
+    service.get_weather(location=location, time_interval="hours", duration=(0, 1))
+
+    assert past_days(service) == [7, 7]